@@ -6,6 +6,7 @@ import matplotlib.pyplot as plt
 
 from ncopt.sqpgs import SQP_GS
 from ncopt.funs import f_rosenbrock, g_max, g_linear
+from ncopt.multistart import multistart
 #from ncopt.torch_obj import Net
 
 #%%
@@ -22,31 +23,31 @@ gE = []
 
 xstar = np.array([1/np.sqrt(2), 0.5])
 
-#%%
-X, Y = np.meshgrid(np.linspace(-2,2,100), np.linspace(-2,2,100))
-Z = np.zeros_like(X)
-
-for j in np.arange(100):
-    for i in np.arange(100):
-        Z[i,j] = f.eval(np.array([X[i,j], Y[i,j]]))
-
-
-fig, ax = plt.subplots()
-ax.contourf(X,Y,Z, levels = 20)
-ax.scatter(xstar[0], xstar[1], marker = "*", s = 200, c = "gold", alpha = 1, zorder = 200)   
+# the process pool of multistart re-imports this file (spawn start method on macOS, Windows), hence the guard
+if __name__ == '__main__':
+    #%%
+    X, Y = np.meshgrid(np.linspace(-2,2,100), np.linspace(-2,2,100))
+    Z = np.zeros_like(X)
 
+    for j in np.arange(100):
+        for i in np.arange(100):
+            Z[i,j] = f.eval(np.array([X[i,j], Y[i,j]]))
 
-for i in range(20):
-    x0 = np.random.randn(2)# np.zeros(2)
-    x_k, x_hist, SP = SQP_GS(f, gI, gE, x0, tol = 1e-6, max_iter = 100, verbose = False)
-    print(x_k)
-    ax.plot(x_hist[:,0], x_hist[:,1], c = "silver", lw = 0.7, ls = '--', alpha = 0.5)
-    ax.scatter(x_k[0], x_k[1], marker = "+", s = 50, c = "k", alpha = 1, zorder = 210)
-    
-ax.set_xlim(-2,2)
-ax.set_ylim(-2,2)
 
+    fig, ax = plt.subplots()
+    ax.contourf(X,Y,Z, levels = 20)
+    ax.scatter(xstar[0], xstar[1], marker = "*", s = 200, c = "gold", alpha = 1, zorder = 200)   
 
 
+    # 20 random starts, solved in parallel
+    res = multistart(f, gI, gE, n_starts = 20, seed = 1, tol = 1e-6, max_iter = 100)
+    print("best solution: ", res['x'])
 
+    for r in res['starts']:
+        x_k = r['x']; x_hist = r['x_hist']
+        print(x_k)
+        ax.plot(x_hist[:,0], x_hist[:,1], c = "silver", lw = 0.7, ls = '--', alpha = 0.5)
+        ax.scatter(x_k[0], x_k[1], marker = "+", s = 50, c = "k", alpha = 1, zorder = 210)
 
+    ax.set_xlim(-2,2)
+    ax.set_ylim(-2,2)
@@ -1,2 +1,38 @@
+"""
+author: Fabian Schaipp
 
+The public API is loaded lazily: submodules (and heavy backends like cvxopt, torch or scipy) are only imported
+when one of their attributes is accessed for the first time.
+"""
 
+import importlib
+
+# public name --> submodule
+_LAZY = {'SQP_GS': 'sqpgs',
+         'Subproblem': 'sqpgs',
+         'LineSearch': 'linesearch',
+         'sample_points': 'sampling',
+         'FiniteDifference': 'finite_diff',
+         'multistart': 'multistart',
+         'SQP_GS_batch': 'batch',
+         'InstanceBatch': 'batch',
+         'Net': 'torch_obj',
+         'fit_surrogate': 'torch_surrogate',
+         'SurrogateConstraint': 'surrogate',
+         'RemoteFunction': 'remote',
+         'OracleServer': 'remote',
+         }
+
+__all__ = list(_LAZY.keys())
+
+def __getattr__(name):
+    if name in _LAZY:
+        module = importlib.import_module('.' + _LAZY[name], __name__)
+        value = getattr(module, name)
+        # cache, so __getattr__ is only called once per name
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(list(globals().keys()) + __all__)
@@ -0,0 +1,367 @@
+"""
+author: Fabian Schaipp
+
+Batched version of SQP-GS for many problem instances which share the same structure (dimensions, number of constraints)
+and only differ in their parameters.
+
+Batched function objects have the attributes dim, dimOut, n_instances and the methods
+    eval(X, ix) : X of shape (len(ix), N, dim) --> array of shape (len(ix), N, dimOut)
+    grad(X, ix) : X of shape (len(ix), N, dim) --> array of shape (len(ix), N, dimOut, dim)
+where ix are the indices of the instances the rows of X belong to. See ncopt.funs.g_linear_batch for an example.
+Ordinary function objects can be stacked with InstanceBatch.
+"""
+
+import time
+import numpy as np
+
+from .sqpgs import q_rho, stop_criterion, update_hessian, Subproblem, GradientRows, G_product, G_operator, structured_kktsolver
+from .sampling import sample_points
+
+class InstanceBatch:
+    """
+    stacks a list of ordinary function objects (one per instance) into a batched function object
+    the oracles are called in a loop, use this only if no vectorized implementation is available
+    """
+    def __init__(self, funs):
+        self.name = 'instance_batch'
+        self.funs = funs
+        self.n_instances = len(funs)
+        self.dim = getattr(funs[0], 'dim', None)
+        self.dimOut = funs[0].dimOut
+        return
+
+    def eval(self, X, ix):
+        (B, N, _) = X.shape
+        V = np.zeros((B, N, self.dimOut))
+        for b in np.arange(B):
+            for i in np.arange(N):
+                V[b,i,:] = self.funs[ix[b]].eval(X[b,i,:])
+        return V
+
+    def grad(self, X, ix):
+        (B, N, dim) = X.shape
+        D = np.zeros((B, N, self.dimOut, dim))
+        for b in np.arange(B):
+            for i in np.arange(N):
+                D[b,i,:,:] = self.funs[ix[b]].grad(X[b,i,:])
+        return D
+
+def _component_rows(arrays, B, width = None):
+    """
+    batched version of ncopt.sqpgs.component_blocks: arrays of shape (B, N, dimOut) or (B, N, dimOut, dim) are stacked
+    component by component along the second axis
+    
+    Returns
+    -------
+    array of shape (B, rows) or (B, rows, dim), start index of every block
+    """
+    if len(arrays) == 0:
+        return np.zeros((B, 0) if width is None else (B, 0, width)), np.zeros(0, dtype = int)
+    
+    rows = [np.swapaxes(A, 1, 2).reshape((B, -1) + A.shape[3:]) for A in arrays]
+    counts = np.concatenate([np.full(A.shape[2], A.shape[1], dtype = int) for A in arrays])
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(int)
+    
+    return np.concatenate(rows, axis = 1), starts
+
+def solve_subproblems(SP):
+    """
+    solves the direction QPs of several instances as one block-diagonal QP, i.e. with one call of cvxopt.solvers.qp
+    
+    SP is a list of Subproblem objects with the same structure, each updated for the current iteration. The KKT systems
+    of all blocks are solved at once (see ncopt.sqpgs.structured_kktsolver). If the joint QP is not solved to 
+    optimality, the QPs are solved separately.
+    """
+    import cvxopt as cx
+    cx.solvers.options['show_progress'] = False
+    
+    B = len(SP)
+    dim, n, mG = SP[0].dim, SP[0].dimQP, len(SP[0].h)
+    ns, slack = n - dim, SP[0].slack
+    
+    # block-diagonal P, G as a function of the gradient rows of all blocks (stacked segment by segment)
+    P = cx.spdiag([sp.matrix_P() for sp in SP])
+    segments = [sp.segments() for sp in SP]
+    rows = GradientRows([(np.concatenate([seg[k][0] for seg in segments]),) + segments[0][k][1:] for k in range(len(segments[0]))])
+    G = G_operator(rows, slack, ns)
+    q = cx.matrix(np.concatenate([sp.q for sp in SP]))
+    h = cx.matrix(np.concatenate([sp.h for sp in SP]))
+    
+    H = np.stack([sp.P_V.reshape(dim, dim) for sp in SP])
+    kktsolver = lambda W: structured_kktsolver(H, rows, slack, ns, W)
+    
+    t0 = time.perf_counter()
+    qp = cx.solvers.qp(P = P, q = q, G = G, h = h, kktsolver = kktsolver)
+    t = time.perf_counter() - t0
+    
+    if qp["status"] != 'optimal':
+        for sp in SP:
+            sp.solve()
+        return
+    
+    x = np.array(qp['x']).reshape(B, n)
+    s = np.array(qp['s']).reshape(B, mG)
+    z = np.array(qp['z']).reshape(B, mG)
+    
+    # the stopping criteria of cvxopt apply to the sum of all blocks, i.e. a block with large residuals or a large 
+    # objective value can hide an inaccurate solution of another block: blocks which do not meet the (default) 
+    # criteria on their own residuals and duality gap are solved again separately
+    q_ = np.stack([sp.q for sp in SP]); h_ = np.stack([sp.h for sp in SP])
+    
+    Gx = G_product(rows, slack, ns, x)
+    Gz = G_product(rows, slack, ns, z, 'T')
+    Px = np.hstack(((H @ x[:,:dim,np.newaxis])[:,:,0], np.zeros((B, ns))))
+    
+    pres = np.linalg.norm(Gx + s - h_, axis = 1) / np.maximum(1, np.linalg.norm(h_, axis = 1))
+    dres = np.linalg.norm(Px + q_ + Gz, axis = 1) / np.maximum(1, np.linalg.norm(q_, axis = 1))
+    gap = np.sum(s*z, axis = 1)
+    pobj = np.sum(q_*x, axis = 1) + 0.5*np.sum(Px*x, axis = 1)
+    
+    opts = cx.solvers.options
+    accurate = (pres <= opts.get('feastol', 1e-7)) & (dres <= opts.get('feastol', 1e-7)) \
+             & ((gap <= opts.get('abstol', 1e-7)) | (gap <= opts.get('reltol', 1e-6) * np.abs(pobj)))
+    
+    if not np.any(accurate):
+        for sp in SP:
+            sp.solve()
+        return
+    
+    for b in np.where(accurate)[0]:
+        SP[b].n_solves += 1
+        SP[b].qp_time += t / B
+        SP[b].qp_iter += qp["iterations"]
+        SP[b].status = qp["status"]
+        SP[b].set_solution(x[b], z[b])
+    
+    # the remaining blocks are solved again (jointly), without the blocks which dominated the stopping criteria
+    if not np.all(accurate):
+        solve_subproblems([SP[b] for b in np.where(~accurate)[0]])
+    return
+
+def phi_rho_batch(X, ix, f, gI, gE, rho):
+    """
+    merit function phi_rho for every row of X (row b belongs to instance ix[b])
+    """
+    Xb = X[:,np.newaxis,:]
+    phi = rho*f.eval(Xb, ix)[:,0,0]
+    for g in gI:
+        phi += np.maximum(g.eval(Xb, ix)[:,0,:], 0).sum(axis = 1)
+    for g in gE:
+        phi += np.abs(g.eval(Xb, ix)[:,0,:]).sum(axis = 1)
+    return phi
+
+def SQP_GS_batch(f, gI, gE, x0 = None, tol = 1e-8, max_iter = 100, verbose = True, assert_tol = 1e-5, rng = None, sampling = 'random', n_samples = (2, 3, 4)):
+    """
+    Runs SQP-GS on all instances simultaneously. Sampling and oracle calls are done for all active instances at once
+    (leading batch dimension). Instances with E_k <= tol are removed from the active set.
+    The direction QPs of all active instances are solved as one block-diagonal QP, see solve_subproblems.
+
+    Parameters
+    ----------
+    f : batched function object
+        objective.
+    gI : list of batched function objects
+        inequality constraints.
+    gE : list of batched function objects
+        equality constraints.
+    x0 : array, optional
+        Starting points of shape (n_instances, dim). The default is zero.
+    tol, max_iter, verbose, assert_tol, rng, sampling, n_samples:
+        see SQP_GS.
+
+    Returns
+    -------
+    x_k : array
+        Final iterates, shape (n_instances, dim).
+    x_hist : list
+        Iterate history for each instance.
+    info : dict
+        'status', 'n_iter' and 'E_k' per instance.
+    """
+    # parameters (set after recommendations in paper)
+    eta = 1e-8
+    gamma = 0.5
+    beta_eps = 0.5
+    beta_rho = 0.5
+    beta_theta = 0.8
+    nu = 10
+    xi_s = 1e3
+    xi_y = 1e3
+    xi_sy = 1e-6
+    iter_H = 10
+
+    n_inst = f.n_instances
+    dim = f.dim
+    dimI = np.array([g.dimOut for g in gI], dtype = int)
+    dimE = np.array([g.dimOut for g in gE], dtype = int)
+
+    nI_ = len(gI); nE_ = len(gE)
+    nI = sum(dimI); nE = sum(dimE)
+
+    p0 = int(n_samples[0])
+    pI_ = n_samples[1] * np.ones(nI_, dtype = int)
+    pE_ = n_samples[2] * np.ones(nE_, dtype = int)
+    # constant Jacobians are only evaluated at x_k (see SQP_GS)
+    cI_ = np.array([getattr(g, 'constant_grad', False) for g in gI], dtype = bool)
+    cE_ = np.array([getattr(g, 'constant_grad', False) for g in gE], dtype = bool)
+    pI = np.repeat(np.where(cI_, 0, pI_), dimI)
+    pE = np.repeat(np.where(cE_, 0, pE_), dimE)
+
+    # offsets of each function in the joint sample
+    offsets = np.cumsum(np.hstack((0, p0, pI_, pE_))).astype(int)
+    n_total = offsets[-1]
+    rng = np.random.default_rng(rng)
+
+    # per-instance state
+    if x0 is None:
+        x_k = np.zeros((n_inst, dim))
+    else:
+        x_k = np.array(x0, dtype = float).copy()
+
+    eps = 1e-1 * np.ones(n_inst)
+    rho = 1e-1 * np.ones(n_inst)
+    theta = 1e-1 * np.ones(n_inst)
+    E_k = np.inf * np.ones(n_inst)
+
+    H = np.tile(np.eye(dim), (n_inst, 1, 1))
+    s_hist = np.zeros((n_inst, dim, iter_H))
+    y_hist = np.zeros((n_inst, dim, iter_H))
+    x_kmin1 = np.zeros((n_inst, dim)); g_kmin1 = np.zeros((n_inst, dim))
+    has_prev = np.zeros(n_inst, dtype = bool)
+
+    SP = [Subproblem(dim, nI, nE, p0, pI, pE) for i in range(n_inst)]
+
+    x_hist = [[x_k[i].copy()] for i in range(n_inst)]
+    n_iter = np.zeros(n_inst, dtype = int)
+    status = np.array(n_inst * ['max iterations reached'], dtype = object)
+    active = np.arange(n_inst)
+
+    ##############################################
+    # START OF LOOP
+    ##############################################
+    for iter_k in range(max_iter):
+
+        done = E_k[active] <= tol
+        status[active[done]] = 'optimal'
+        active = active[~done]
+
+        if len(active) == 0:
+            break
+
+        nA = len(active)
+        xA = x_k[active]
+
+        if verbose:
+            print(f"iteration {iter_k}: {nA} active instances")
+
+        ##############################################
+        # SAMPLING (all functions, all active instances)
+        ##############################################
+        B = np.concatenate((xA[:,np.newaxis,:], sample_points(xA, eps[active], n_total, rng, sampling)), axis = 1)
+        # B[:,0,:] is x_k, the samples of function l are B[:, 1+offsets[l] : 1+offsets[l+1]]
+        def samples_of(l):
+            return np.concatenate((B[:,:1,:], B[:,1+offsets[l]:1+offsets[l+1],:]), axis = 1)
+
+        B_f = samples_of(0)
+        B_gI = [samples_of(1+j) for j in range(nI_)]
+        B_gE = [samples_of(1+nI_+j) for j in range(nE_)]
+
+        ####################################
+        # COMPUTE GRADIENTS AND EVALUATE
+        ###################################
+        D_f = f.grad(B_f, active)[:,:,0,:]
+
+        # Jacobians and values of all components, stacked component by component (see component_blocks)
+        G_I, starts_I = _component_rows([gI[j].grad(B_gI[j][:,:1] if cI_[j] else B_gI[j], active) for j in range(nI_)], nA, dim)
+        G_E, starts_E = _component_rows([gE[j].grad(B_gE[j][:,:1] if cE_[j] else B_gE[j], active) for j in range(nE_)], nA, dim)
+        V_I, starts_VI = _component_rows([gI[j].eval(B_gI[j], active) for j in range(nI_)], nA)
+        V_E, starts_VE = _component_rows([gE[j].eval(B_gE[j], active) for j in range(nE_)], nA)
+
+        f_k = f.eval(xA[:,np.newaxis,:], active)[:,0,0]
+        # values at x_k are the first sample
+        gI_k = V_I[:,starts_VI]
+        gE_k = V_E[:,starts_VE]
+
+        ##############################################
+        # SUBPROBLEMS (one block-diagonal QP)
+        ##############################################
+        v_k = np.maximum(gI_k, 0).sum(axis = 1) + np.abs(gE_k).sum(axis = 1)
+        phi_k = rho[active]*f_k + v_k
+
+        for a, i in enumerate(active):
+            SP[i].update(H[i], rho[i], D_f[a], (G_I[a], starts_I), (G_E[a], starts_E), f_k[a], gI_k[a], gE_k[a])
+        solve_subproblems([SP[i] for i in active])
+
+        d_k = np.stack([SP[i].d for i in active])
+        g_k = np.einsum('bn,bnd->bd', np.stack([SP[i].lambda_f for i in active]), D_f) \
+            + np.einsum('bn,bnd->bd', np.stack([SP[i].lambda_I for i in active]), G_I) \
+            + np.einsum('bn,bnd->bd', np.stack([SP[i].lambda_E for i in active]), G_E)
+        delta_q = np.zeros(nA)
+
+        for a, i in enumerate(active):
+            delta_q[a] = phi_k[a] - q_rho(d_k[a], rho[i], H[i], f_k[a], gI_k[a], gE_k[a], D_f[a], (G_I[a], starts_I), (G_E[a], starts_E))
+
+            assert delta_q[a] >= -assert_tol
+            assert np.abs(SP[i].lambda_f.sum() - rho[i]) <= assert_tol, f"{np.abs(SP[i].lambda_f.sum() - rho[i])}"
+
+            new_E_k = stop_criterion(g_k[a], gI_k[a], gE_k[a], (SP[i].lambda_I, SP[i].starts_I), (SP[i].lambda_E, SP[i].starts_E),
+                                     (V_I[a], starts_VI), (V_E[a], starts_VE))
+            E_k[i] = min(E_k[i], new_E_k)
+
+        ##############################################
+        # STEP
+        ##############################################
+        step = delta_q > nu*eps[active]**2
+
+        # Armijo step size rule, all instances which take a step search simultaneously
+        alpha = np.ones(nA)
+        search = np.where(step)[0]
+        while len(search) > 0:
+            i_s = active[search]
+            phi_new = phi_rho_batch(xA[search] + alpha[search,np.newaxis]*d_k[search], i_s, f, gI, gE, rho[i_s])
+            fail = phi_new > phi_k[search] - eta*alpha[search]*delta_q[search]
+            search = search[fail]
+            alpha[search] *= gamma
+
+        for a in np.where(step)[0]:
+            i = active[a]
+            # update Hessian
+            if has_prev[i]:
+                s_hist[i] = np.roll(s_hist[i], 1, axis = 1)
+                s_hist[i][:,0] = x_k[i] - x_kmin1[i]
+                y_hist[i] = np.roll(y_hist[i], 1, axis = 1)
+                y_hist[i][:,0] = g_k[a] - g_kmin1[i]
+
+                H[i] = update_hessian(s_hist[i], y_hist[i], eps[i], xi_s, xi_y, xi_sy)
+
+            x_kmin1[i] = x_k[i]
+            g_kmin1[i] = g_k[a]
+            has_prev[i] = True
+
+            x_k[i] = x_k[i] + alpha[a]*d_k[a]
+
+        ##############################################
+        # NO STEP
+        ##############################################
+        no_step = active[~step]
+        small_v = v_k[~step] <= theta[no_step]
+        theta[no_step[small_v]] *= beta_theta
+        rho[no_step[~small_v]] *= beta_rho
+        eps[no_step] *= beta_eps
+
+        n_iter[active] += 1
+        for i in active:
+            x_hist[i].append(x_k[i].copy())
+
+    ##############################################
+    # END OF LOOP
+    ##############################################
+    status[E_k <= tol] = 'optimal'
+    x_hist = [np.vstack(h) for h in x_hist]
+
+    if verbose:
+        print(f"SQP-GS (batch) has terminated, {np.sum(status == 'optimal')} of {n_inst} instances optimal")
+
+    info = {'status': status, 'n_iter': n_iter, 'E_k': E_k}
+
+    return x_k, x_hist, info
@@ -0,0 +1,12 @@
+"""
+author: Fabian Schaipp
+
+Benchmark suite for SQP-GS. Run from the command line with
+
+    python -m ncopt.benchmarks --out results.jsonl
+
+see python -m ncopt.benchmarks --help for all options.
+"""
+
+from .problems import PROBLEMS, make_problem, default_suite
+from .run import run_problem, run_suite, load_records, compare
@@ -0,0 +1,49 @@
+"""
+author: Fabian Schaipp
+"""
+
+import argparse
+import sys
+
+from .problems import PROBLEMS, make_problem
+from .run import run_suite, load_records, compare
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(prog = 'python -m ncopt.benchmarks', description = 'Benchmarks for SQP-GS.')
+    parser.add_argument('--problems', nargs = '+', default = PROBLEMS, choices = PROBLEMS)
+    parser.add_argument('--dims', nargs = '+', type = int, default = [2, 5, 10])
+    parser.add_argument('--n-cons', nargs = '+', type = int, default = [1, 5, 20], help = 'numbers of constraints for the constraint families')
+    parser.add_argument('--max-iter', type = int, default = 100)
+    parser.add_argument('--tol', type = float, default = 1e-8)
+    parser.add_argument('--repeats', type = int, default = 1)
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--out', default = None, help = 'write results as JSON lines to this file')
+    parser.add_argument('--baseline', default = None, help = 'JSON lines file to compare wall times with')
+    parser.add_argument('--rtol', type = float, default = 0.5, help = 'allowed relative slowdown w.r.t. the baseline')
+    args = parser.parse_args(argv)
+
+    problems = list()
+    for name in args.problems:
+        for dim in args.dims:
+            n_cons = args.n_cons if name.endswith('_family') else [1]
+            problems += [make_problem(name, dim, n_con, args.seed) for n_con in n_cons]
+
+    records = run_suite(problems, out = args.out, repeats = args.repeats, tol = args.tol, max_iter = args.max_iter, seed = args.seed)
+
+    fmt = "%-22s %4s %5s %10s %6s %9s %9s %8s %10s"
+    print(fmt % ('problem', 'dim', 'n_con', 'wall[s]', 'iter', 'n_eval', 'n_grad', 'qp[s]', 'status'))
+    for rec in records:
+        print(fmt % (rec['problem'], rec['dim'], rec['n_con'], f"{rec['wall_time']:.3f}", rec['n_iter'], rec['n_eval'],
+                     rec['n_grad'], f"{rec['qp_time']:.3f}", rec['status']))
+
+    if args.baseline is not None:
+        regressions = compare(load_records(args.baseline), records, rtol = args.rtol)
+        for r in regressions:
+            print("REGRESSION %s dim=%d n_con=%d: %.3fs --> %.3fs (x%.2f)" % r)
+        if len(regressions) > 0:
+            return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,244 @@
+"""
+author: Fabian Schaipp
+
+Scalable test problems, inspired by the examples in Curtis, Overton "SQP FOR NONSMOOTH CONSTRAINED OPTIMIZATION".
+All function objects follow the interface of ncopt.funs (dim, dimOut, eval, grad) and additionally provide eval_batch.
+"""
+
+import numpy as np
+
+from ..funs import g_linear
+
+#%% objectives
+
+class f_rosenbrock_nd:
+    """
+    chained nonsmooth Rosenbrock function, for dim = 2 this is the function from Section 5.1
+
+    x -> sum_i w|x_i^2 − x_{i+1}| + (1 − x_i)^2
+    """
+    def __init__(self, dim, w = 8):
+        self.name = 'rosenbrock_nd'
+        self.dim = dim
+        self.dimOut = 1
+        self.w = w
+
+    def eval(self, x):
+        return np.sum(self.w*np.abs(x[:-1]**2 - x[1:]) + (1-x[:-1])**2, axis = 0)
+
+    def eval_batch(self, X):
+        return self.eval(X.T)[:,np.newaxis]
+
+    def grad(self, x):
+        s = np.sign(x[:-1]**2 - x[1:])
+        g = np.zeros(self.dim)
+        g[:-1] += 2*self.w*s*x[:-1] - 2*(1-x[:-1])
+        g[1:] -= self.w*s
+        return g
+
+class f_chebyshev_rosenbrock:
+    """
+    nonsmooth Chebyshev-Rosenbrock function (Nesterov)
+
+    x -> 1/4 (x_1 - 1)^2 + sum_i |x_{i+1} − 2x_i^2 + 1|
+    """
+    def __init__(self, dim):
+        self.name = 'chebyshev_rosenbrock'
+        self.dim = dim
+        self.dimOut = 1
+
+    def eval(self, x):
+        return 0.25*(x[0]-1)**2 + np.sum(np.abs(x[1:] - 2*x[:-1]**2 + 1), axis = 0)
+
+    def eval_batch(self, X):
+        return self.eval(X.T)[:,np.newaxis]
+
+    def grad(self, x):
+        s = np.sign(x[1:] - 2*x[:-1]**2 + 1)
+        g = np.zeros(self.dim)
+        g[0] = 0.5*(x[0]-1)
+        g[1:] += s
+        g[:-1] -= 4*s*x[:-1]
+        return g
+
+class f_chebyshev_approx:
+    """
+    Chebyshev (minimax) approximation of h(t) = |t| on [-1,1] with the first dim Chebyshev polynomials
+
+    x -> max_j |sum_i x_i T_i(t_j) - h(t_j)|, t_j on a grid with m points
+    """
+    def __init__(self, dim, m = 50):
+        self.name = 'chebyshev_approx'
+        self.dim = dim
+        self.dimOut = 1
+        self.t = np.linspace(-1, 1, m)
+        self.T = np.polynomial.chebyshev.chebvander(self.t, dim-1)
+        self.h = np.abs(self.t)
+
+    def eval(self, x):
+        return np.max(np.abs(self.T @ x - self.h))
+
+    def eval_batch(self, X):
+        return np.max(np.abs(X @ self.T.T - self.h), axis = 1)[:,np.newaxis]
+
+    def grad(self, x):
+        r = self.T @ x - self.h
+        j = np.argmax(np.abs(r))
+        return np.sign(r[j]) * self.T[j,:]
+
+class f_max_eig:
+    """
+    maximal eigenvalue of an affine matrix function
+
+    x -> lambda_max(A_0 + sum_i x_i A_i), A_i random symmetric n x n matrices
+    """
+    def __init__(self, dim, n = 10, seed = 0):
+        self.name = 'max_eig'
+        self.dim = dim
+        self.dimOut = 1
+        rng = np.random.default_rng(seed)
+        A = rng.standard_normal((dim+1, n, n))
+        self.A = (A + np.transpose(A, (0,2,1))) / 2
+
+    def _mat(self, x):
+        return self.A[0] + np.tensordot(x, self.A[1:], axes = 1)
+
+    def eval(self, x):
+        return np.linalg.eigvalsh(self._mat(x))[-1]
+
+    def eval_batch(self, X):
+        M = self.A[0] + np.tensordot(X, self.A[1:], axes = 1)
+        return np.linalg.eigvalsh(M)[:,-1:]
+
+    def grad(self, x):
+        _, V = np.linalg.eigh(self._mat(x))
+        v = V[:,-1]
+        return np.einsum('i,kij,j->k', v, self.A[1:], v)
+
+class f_entropy:
+    """
+    negative entropy, extended linearly below delta (nonsmooth in the second derivative, unbounded below without constraints)
+
+    x -> sum_i phi(x_i), phi(t) = t log(t) for t >= delta
+    """
+    def __init__(self, dim, delta = 1e-3):
+        self.name = 'entropy'
+        self.dim = dim
+        self.dimOut = 1
+        self.delta = delta
+
+    def eval(self, x):
+        d = self.delta
+        t = np.maximum(x, d)
+        return np.sum(t*np.log(t) + (1+np.log(d))*np.minimum(x-d, 0), axis = 0)
+
+    def eval_batch(self, X):
+        return self.eval(X.T)[:,np.newaxis]
+
+    def grad(self, x):
+        return 1 + np.log(np.maximum(x, self.delta))
+
+#%% constraints
+
+class g_max_nd:
+    """
+    maximum function, for dim = 2 and c = (sqrt(2), 2) this is ncopt.funs.g_max
+
+    x -> max_i c_i x_i - 1
+    """
+    def __init__(self, c):
+        self.name = 'max_nd'
+        self.c = c
+        self.dim = len(c)
+        self.dimOut = 1
+
+    def eval(self, x):
+        return np.max(self.c*x) - 1
+
+    def eval_batch(self, X):
+        return np.max(X*self.c, axis = 1)[:,np.newaxis] - 1
+
+    def grad(self, x):
+        g = np.zeros(self.dim)
+        j = np.argmax(self.c*x)
+        g[j] = self.c[j]
+        return g
+
+def max_family(dim, n_con, rng):
+    """
+    n_con max-constraints with random positive weights
+    """
+    return [g_max_nd(1 + rng.random(dim)) for j in range(n_con)]
+
+def linear_family(dim, n_con, rng):
+    """
+    n_con linear constraints a_j x <= 1 (each as its own function object), the origin is strictly feasible
+    """
+    return [g_linear(rng.standard_normal((1, dim)), np.ones(1)) for j in range(n_con)]
+
+#%% problem sets
+
+def make_problem(name, dim, n_con = 1, seed = 0):
+    """
+    Parameters
+    ----------
+    name : str
+        one of PROBLEMS.
+    dim : int
+        dimension of the problem.
+    n_con : int, optional
+        number of constraint objects (for the constraint families). The default is 1.
+    seed : int, optional
+        seed for the problem data and the starting point. The default is 0.
+
+    Returns
+    -------
+    dict with keys name, dim, n_con, f, gI, gE, x0
+    """
+    rng = np.random.default_rng(seed)
+    gE = []
+
+    if name == 'rosenbrock':
+        f = f_rosenbrock_nd(dim)
+        c = np.ones(dim) * 2; c[0] = np.sqrt(2)
+        gI = [g_max_nd(c)]
+    elif name == 'chebyshev_rosenbrock':
+        f = f_chebyshev_rosenbrock(dim)
+        gI = [g_linear(np.vstack((np.eye(dim), -np.eye(dim))), np.ones(2*dim))]
+    elif name == 'chebyshev_approx':
+        f = f_chebyshev_approx(dim)
+        gI = [g_linear(np.vstack((np.eye(dim), -np.eye(dim))), np.ones(2*dim))]
+    elif name == 'max_eig':
+        f = f_max_eig(dim, seed = seed)
+        gI = [g_linear(np.vstack((np.eye(dim), -np.eye(dim))), np.ones(2*dim))]
+    elif name == 'entropy':
+        f = f_entropy(dim)
+        gI = [g_linear(-np.eye(dim), np.zeros(dim))]
+        gE = [g_linear(np.ones((1, dim)), np.ones(1))]
+    elif name == 'max_family':
+        f = f_rosenbrock_nd(dim)
+        gI = max_family(dim, n_con, rng)
+    elif name == 'linear_family':
+        f = f_rosenbrock_nd(dim)
+        gI = linear_family(dim, n_con, rng)
+    else:
+        raise ValueError(f"Unknown problem {name}, choose from {PROBLEMS}.")
+
+    x0 = 0.5*rng.standard_normal(dim)
+
+    return {'name': name, 'dim': dim, 'n_con': len(gI) + len(gE), 'f': f, 'gI': gI, 'gE': gE, 'x0': x0}
+
+PROBLEMS = ['rosenbrock', 'chebyshev_rosenbrock', 'chebyshev_approx', 'max_eig', 'entropy', 'max_family', 'linear_family']
+
+def default_suite(dims = (2, 5, 10), n_cons = (1, 5, 20), seed = 0):
+    """
+    all problems at all dimensions, the constraint families additionally for all numbers of constraints
+    """
+    suite = list()
+    for name in PROBLEMS:
+        for dim in dims:
+            if name.endswith('_family'):
+                suite += [make_problem(name, dim, n_con, seed) for n_con in n_cons]
+            else:
+                suite.append(make_problem(name, dim, seed = seed))
+    return suite
@@ -0,0 +1,133 @@
+"""
+author: Fabian Schaipp
+
+Runs SQP-GS on benchmark problems and records wall time, iterations, oracle calls and QP time.
+"""
+
+import json
+import time
+import platform
+import numpy as np
+
+from ..sqpgs import SQP_GS
+from ..multistart import constraint_violation
+
+class CountingFunction:
+    """
+    wraps a function object and counts the oracle calls (number of points at which eval/grad were evaluated)
+    """
+    def __init__(self, fun):
+        self.fun = fun
+        self.name = getattr(fun, 'name', 'fun')
+        self.dimOut = fun.dimOut
+        if hasattr(fun, 'dim'):
+            self.dim = fun.dim
+        self.constant_grad = getattr(fun, 'constant_grad', False)
+        self.n_eval = 0
+        self.n_grad = 0
+
+    def eval(self, x):
+        self.n_eval += 1
+        return self.fun.eval(x)
+
+    def grad(self, x):
+        self.n_grad += 1
+        return self.fun.grad(x)
+
+    def eval_batch(self, X):
+        if hasattr(self.fun, 'eval_batch'):
+            self.n_eval += X.shape[0]
+            return self.fun.eval_batch(X)
+        return np.vstack([np.atleast_1d(self.eval(X[i,:])) for i in range(X.shape[0])])
+
+    def grad_batch(self, X):
+        if hasattr(self.fun, 'grad_batch'):
+            self.n_grad += X.shape[0]
+            return self.fun.grad_batch(X)
+        return np.stack([np.reshape(self.grad(X[i,:]), (self.dimOut, -1)) for i in range(X.shape[0])])
+
+def run_problem(problem, tol = 1e-8, max_iter = 100, seed = 0, **solver_kwargs):
+    """
+    solves one problem (see problems.make_problem) and returns a flat dictionary of results
+    """
+    f = CountingFunction(problem['f'])
+    gI = [CountingFunction(g) for g in problem['gI']]
+    gE = [CountingFunction(g) for g in problem['gE']]
+    allfuns = [f] + gI + gE
+
+    t0 = time.perf_counter()
+    x_k, x_hist, SP, info = SQP_GS(f, gI, gE, problem['x0'], tol = tol, max_iter = max_iter, verbose = False,
+                                   return_info = True, rng = seed, **solver_kwargs)
+    wall_time = time.perf_counter() - t0
+
+    record = {'problem': problem['name'],
+              'dim': problem['dim'],
+              'n_con': problem['n_con'],
+              'status': info['status'],
+              'n_iter': info['n_iter'],
+              'wall_time': wall_time,
+              'n_eval': sum([fun.n_eval for fun in allfuns]),
+              'n_grad': sum([fun.n_grad for fun in allfuns]),
+              'n_qp': info['n_qp'],
+              'qp_time': info['qp_time'],
+              'qp_time_per_solve': info['qp_time'] / max(info['n_qp'], 1),
+              'qp_iter': info['qp_iter'],
+              'n_merit': int(info['n_merit'].sum()),
+              'f': float(np.squeeze(problem['f'].eval(x_k))),
+              'viol': constraint_violation(x_k, problem['gI'], problem['gE']),
+              'E_k': float(info['E_k']),
+              }
+    return record
+
+def run_suite(problems, out = None, repeats = 1, **kwargs):
+    """
+    runs all problems (repeats times each) and writes one JSON object per line to out (file name), if given
+
+    Returns
+    -------
+    list of records
+    """
+    meta = {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine()}
+
+    records = list()
+    for problem in problems:
+        for r in range(repeats):
+            rec = run_problem(problem, **kwargs)
+            rec['repeat'] = r
+            rec.update(meta)
+            records.append(rec)
+
+    if out is not None:
+        with open(out, 'w') as file:
+            for rec in records:
+                file.write(json.dumps(rec) + '\n')
+
+    return records
+
+def load_records(path):
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+def compare(baseline, records, key = 'wall_time', rtol = 0.5):
+    """
+    compares records with a baseline (both lists of records), matched by (problem, dim, n_con), using the median
+    over repeats
+
+    Returns
+    -------
+    list of (problem, dim, n_con, baseline value, new value, ratio) where the new value exceeds the baseline by more
+    than a factor 1+rtol
+    """
+    def medians(recs):
+        groups = dict()
+        for rec in recs:
+            groups.setdefault((rec['problem'], rec['dim'], rec['n_con']), []).append(rec[key])
+        return {k: float(np.median(v)) for k, v in groups.items()}
+
+    old = medians(baseline); new = medians(records)
+
+    regressions = list()
+    for k in new:
+        if k in old and new[k] > (1+rtol) * old[k]:
+            regressions.append(k + (old[k], new[k], new[k]/max(old[k], 1e-16)))
+    return regressions
@@ -0,0 +1,54 @@
+"""
+author: Fabian Schaipp
+
+Checkpoints of the SQP-GS solver state. A checkpoint is a single .npz file (no pickle) and is written atomically:
+the data goes to a temporary file in the same directory which then replaces the old checkpoint.
+"""
+
+import os
+import json
+import tempfile
+import numpy as np
+
+def rng_state(rng):
+    """
+    state of a np.random.Generator as JSON string
+    """
+    return json.dumps(rng.bit_generator.state)
+
+def rng_from_state(state):
+    """
+    inverse of rng_state
+    """
+    state = json.loads(state)
+    bit_generator = getattr(np.random, state['bit_generator'])()
+    bit_generator.state = state
+    return np.random.Generator(bit_generator)
+
+def save_checkpoint(path, state):
+    """
+    writes state (dict of arrays, numbers and strings) atomically to path
+    """
+    path = os.path.abspath(path)
+    fd, tmp = tempfile.mkstemp(dir = os.path.dirname(path), prefix = '.' + os.path.basename(path), suffix = '.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            np.savez(file, **state)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return
+
+def load_checkpoint(path):
+    """
+    Returns
+    -------
+    dict with the arrays stored in path, 0-dim arrays are converted to Python scalars
+    """
+    with np.load(path, allow_pickle = False) as data:
+        state = {k: (data[k].item() if data[k].ndim == 0 else data[k]) for k in data.files}
+    return state
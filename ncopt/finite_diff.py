@@ -0,0 +1,84 @@
+"""
+author: Fabian Schaipp
+
+Gradient oracle from function evaluations only (finite differences).
+"""
+
+import numpy as np
+
+from .sqpgs import eval_rows
+
+FD_METHODS = ['forward', 'central', 'complex']
+
+class FiniteDifference:
+    """
+    Wraps a function object which only provides eval (and optionally eval_batch) and adds grad and grad_batch.
+
+    For a batch of N points, all perturbation points are evaluated in one call to eval_batch:
+        forward : N*(dim+1) evaluations (the values at X are reused)
+        central : 2*N*dim evaluations
+        complex : N*dim evaluations with complex input, fun.eval must accept complex arrays (analytic functions only,
+                  e.g. np.abs or np.maximum are not allowed)
+
+    Parameters
+    ----------
+    fun : function object
+        needs attribute dimOut and method eval.
+    method : str, optional
+        'forward', 'central' or 'complex'. The default is 'forward'.
+    h : float, optional
+        Step size (relative to max(1,|x_i|)). The default depends on the method.
+    """
+    def __init__(self, fun, method = 'forward', h = None):
+        if method not in FD_METHODS:
+            raise ValueError(f"Unknown finite difference method {method}, choose from {FD_METHODS}.")
+
+        self.name = 'fd_' + getattr(fun, 'name', 'fun')
+        self.fun = fun
+        self.dimOut = fun.dimOut
+        if hasattr(fun, 'dim'):
+            self.dim = fun.dim
+
+        self.method = method
+        if h is None:
+            h = {'forward': np.sqrt(np.finfo(float).eps), 'central': np.cbrt(np.finfo(float).eps), 'complex': 1e-20}[method]
+        self.h = h
+        return
+
+    def eval(self, x):
+        return self.fun.eval(x)
+
+    def eval_batch(self, X):
+        return eval_rows(self.fun, X)
+
+    def grad(self, x):
+        return self.grad_batch(x[np.newaxis,:])[0]
+
+    def grad_batch(self, X):
+        """
+        Jacobians at all rows of X, array of shape (N, dimOut, dim)
+        """
+        (N, dim) = X.shape
+        # step sizes, shape (N, dim)
+        H = self.h * np.maximum(1, np.abs(X))
+        # P[i,l,:] = X[i,:] + H[i,l] * e_l
+        P = H[:,:,np.newaxis] * np.eye(dim)[np.newaxis,:,:]
+
+        if self.method == 'forward':
+            V = eval_rows(self.fun, np.vstack((X, (X[:,np.newaxis,:] + P).reshape(-1, dim))))
+            V0 = V[:N]
+            V1 = V[N:].reshape(N, dim, self.dimOut)
+            D = (V1 - V0[:,np.newaxis,:]) / H[:,:,np.newaxis]
+
+        elif self.method == 'central':
+            V = eval_rows(self.fun, np.vstack(((X[:,np.newaxis,:] + P).reshape(-1, dim), (X[:,np.newaxis,:] - P).reshape(-1, dim))))
+            V1 = V[:N*dim].reshape(N, dim, self.dimOut)
+            V2 = V[N*dim:].reshape(N, dim, self.dimOut)
+            D = (V1 - V2) / (2*H[:,:,np.newaxis])
+
+        elif self.method == 'complex':
+            V = eval_rows(self.fun, (X[:,np.newaxis,:] + 1j*P).reshape(-1, dim))
+            D = np.imag(V).reshape(N, dim, self.dimOut) / H[:,:,np.newaxis]
+
+        # (N, dim, dimOut) --> Jacobians (N, dimOut, dim)
+        return np.transpose(D, (0,2,1))
@@ -2,6 +2,7 @@
 author: Fabian Schaipp
 """
 
+import os
 import numpy as np
 
 class f_rosenbrock:
@@ -19,6 +20,9 @@ class f_rosenbrock:
     def eval(self, x):    
         return self.w*np.abs(x[0]**2-x[1]) + (1-x[0])**2
     
+    def eval_batch(self, X):
+        return self.eval(X.T)[:,np.newaxis]
+    
     def differentiable(self, x):
         return np.abs(x[0]**2 - x[1]) > 1e-10
     
@@ -52,6 +56,9 @@ class g_max:
     def eval(self, x):
         return np.maximum(self.c1*x[0], self.c2*x[1]) - 1
     
+    def eval_batch(self, X):
+        return self.eval(X.T)[:,np.newaxis]
+    
     def differentiable(self, x):
         return np.abs(self.c1*x[0] -self.c2*x[1]) > 1e-10
     
@@ -76,17 +83,129 @@ class g_linear:
         self.name = 'linear' 
         self.A = A
         self.b = b
-        self.dim = A.shape[0]
-        self.dimOut = A.shape[1]
+        self.dim = A.shape[1]
+        self.dimOut = A.shape[0]
+        # the Jacobian does not depend on x
+        self.constant_grad = True
         return
     
     def eval(self, x):
         return self.A @ x - self.b
     
+    def eval_batch(self, X):
+        return X @ self.A.T - self.b
+    
     def differentiable(self, x):
         return True
     
     def grad(self, x):
         return self.A
+
+class g_linear_mmap:
+    """
+    linear constraint with a large matrix A, which is kept on disk:
+    
+    x -> Ax - b
+    
+    A and b are arrays or paths of .npy files. Files are opened as memory maps (np.load with mmap_mode = 'r'), and
+    Ax - b is evaluated in chunks of chunk_size rows, hence A is never loaded into memory as a whole.
+    As the Jacobian is constant, SQP_GS evaluates it only at x_k (once per iteration), grad returns the memory map. The
+    direction QP reads its rows in chunks (see ncopt.sqpgs.GradientRows) and does not copy A, the memory of an iteration
+    is linear in dimOut (but does not grow with dim). If the QP is degenerate, the fallback to the default KKT solver
+    of cvxopt (Subproblem.solve) holds A as a sparse matrix.
+    """
+    def __init__(self, A, b, chunk_size = 4096):
+        self.name = 'linear_mmap'
+        self.A = np.load(A, mmap_mode = 'r') if isinstance(A, (str, os.PathLike)) else A
+        self.b = np.load(b, mmap_mode = 'r') if isinstance(b, (str, os.PathLike)) else b
+        self.dim = self.A.shape[1]
+        self.dimOut = self.A.shape[0]
+        self.chunk_size = chunk_size
+        self.constant_grad = True
+        assert self.b.shape == (self.dimOut,)
+        return
+    
+    def _chunks(self):
+        for start in range(0, self.dimOut, self.chunk_size):
+            yield slice(start, min(start + self.chunk_size, self.dimOut))
+    
+    def eval(self, x):
+        out = np.zeros(self.dimOut)
+        for S in self._chunks():
+            out[S] = self.A[S] @ x - self.b[S]
+        return out
+    
+    def eval_batch(self, X):
+        out = np.zeros((X.shape[0], self.dimOut))
+        for S in self._chunks():
+            out[:,S] = X @ self.A[S].T - self.b[S]
+        return out
+    
+    def differentiable(self, x):
+        return True
+    
+    def grad(self, x):
+        # no copy for a memory map, the QP assembly reads the rows from disk
+        return self.A
+
+
+class g_linear_batch:
+    """
+    batch of linear constraints with instance-dependent parameters (see ncopt.batch):
+    
+    x -> A_i x - b_i  for instance i
+    
+    A : array of shape (dimOut, dim) (shared by all instances) or (n_instances, dimOut, dim)
+    b : array of shape (n_instances, dimOut)
+    """
+    def __init__(self, A, b):
+        self.name = 'linear_batch'
+        self.A = A
+        self.b = b
+        self.n_instances = b.shape[0]
+        self.dim = A.shape[-1]
+        self.dimOut = A.shape[-2]
+        self.constant_grad = True
+        return
+    
+    def _A(self, ix):
+        if self.A.ndim == 2:
+            return self.A[np.newaxis,:,:]
+        else:
+            return self.A[ix]
     
+    def eval(self, X, ix):
+        # X has shape (len(ix), N, dim)
+        return np.einsum('bmd,bnd->bnm', np.broadcast_to(self._A(ix), (len(ix),)+self.A.shape[-2:]), X) - self.b[ix][:,np.newaxis,:]
+    
+    def grad(self, X, ix):
+        (B, N, _) = X.shape
+        return np.broadcast_to(self._A(ix)[:,np.newaxis,:,:], (B, N, self.dimOut, self.dim))
 
+class f_rosenbrock_batch:
+    """
+    batch of nonsmooth Rosenbrock functions with instance-dependent weights (see ncopt.batch):
+    
+    x -> w_i|x_1^2 − x_2| + (1 − x_1)^2  for instance i
+    
+    w : array of shape (n_instances,)
+    """
+    def __init__(self, w):
+        self.name = 'rosenbrock_batch'
+        self.w = np.asarray(w, dtype = float)
+        self.n_instances = len(self.w)
+        self.dim = 2
+        self.dimOut = 1
+        return
+    
+    def eval(self, X, ix):
+        # X has shape (len(ix), N, 2)
+        w = self.w[ix][:,np.newaxis]
+        return (w*np.abs(X[:,:,0]**2 - X[:,:,1]) + (1 - X[:,:,0])**2)[:,:,np.newaxis]
+    
+    def grad(self, X, ix):
+        w = self.w[ix][:,np.newaxis]
+        # at the kink (x_1^2 = x_2), the element with sign -1 of the subdifferential is used
+        sign = np.where(X[:,:,0]**2 - X[:,:,1] > 0, 1., -1.)
+        D = np.stack((w*sign*2*X[:,:,0] - 2*(1 - X[:,:,0]), -w*sign), axis = 2)
+        return D[:,:,np.newaxis,:]
@@ -0,0 +1,108 @@
+"""
+author: Fabian Schaipp
+
+Step size rules for SQP-GS. A step alpha*d_k is accepted if
+
+    phi(x_k + alpha*d_k) <= ref - eta*alpha*delta_q
+
+where phi is the merit function phi_rho. For the Armijo rule, ref = phi(x_k). For the nonmonotone rule, ref is the
+maximal merit value of the last memory iterates (Grippo, Lampariello, Lucidi), which allows a temporary increase of
+phi, e.g. when the iterates zigzag around a nonsmooth kink. SQP_GS clears the history in every iteration without a step,
+i.e. whenever the sampling radius or the penalty parameters change.
+"""
+
+import numpy as np
+
+class LineSearch:
+    """
+    backtracking line search on the merit function with step sizes 1, gamma, gamma^2, ...
+
+    Parameters
+    ----------
+    memory : int, optional
+        number of past merit values for the nonmonotone rule, 1 is the Armijo rule. The default is 1.
+    ladder : int, optional
+        number of step sizes which are evaluated at once. With ladder > 1, the merit function is evaluated at
+        gamma^k, ..., gamma^(k+ladder-1) in one batched call (eval_batch of the function objects) and the largest
+        acceptable step is taken. This gives the same step as ladder = 1 with fewer sequential oracle calls, but
+        possibly more merit evaluations in total. The default is 1.
+    eta : float, optional
+        sufficient decrease parameter. The default is 1e-8.
+    gamma : float, optional
+        backtracking factor. The default is 0.5.
+    """
+    def __init__(self, memory = 1, ladder = 1, eta = 1e-8, gamma = 0.5):
+        assert memory >= 1 and ladder >= 1
+        self.memory = memory
+        self.ladder = ladder
+        self.eta = eta
+        self.gamma = gamma
+        self.reset()
+        return
+
+    def reset(self):
+        # merit values of the last iterates and the penalty parameter they were computed with
+        self.hist = list()
+        self.rho = None
+        return
+
+    def reference(self, phi_k, rho):
+        """
+        adds phi_k to the history and returns the reference value
+        merit values for another rho are not comparable, hence the history is cleared if rho changes
+        """
+        if rho != self.rho:
+            self.hist = list()
+            self.rho = rho
+
+        self.hist = (self.hist + [phi_k])[-self.memory:]
+        return max(self.hist)
+
+    def search(self, merit, x_k, d_k, phi_k, delta_q, rho):
+        """
+        Parameters
+        ----------
+        merit : callable
+            array of shape (N, dim) --> array of N merit values.
+        x_k, d_k : array
+            iterate and search direction.
+        phi_k : float
+            merit value at x_k.
+        delta_q : float
+            predicted decrease of the QP model, delta_q > 0.
+        rho : float
+            current penalty parameter.
+
+        Returns
+        -------
+        alpha : float
+            step size.
+        phi_new : float
+            merit value at x_k + alpha*d_k.
+        n_eval : int
+            number of merit evaluations.
+        """
+        ref = self.reference(phi_k, rho)
+        n_eval = 0
+        k = 0
+        while True:
+            alphas = self.gamma**np.arange(k, k+self.ladder)
+            phis = merit(x_k[np.newaxis,:] + alphas[:,np.newaxis]*d_k[np.newaxis,:])
+            n_eval += self.ladder
+
+            accept = np.where(phis <= ref - self.eta*alphas*delta_q)[0]
+            if len(accept) > 0:
+                return alphas[accept[0]], phis[accept[0]], n_eval
+
+            k += self.ladder
+
+    def state(self):
+        """
+        history for checkpoints (see ncopt.checkpoint)
+        """
+        return {'ls_hist': np.array(self.hist), 'ls_rho': np.nan if self.rho is None else self.rho}
+
+    def load_state(self, state):
+        self.hist = list(state['ls_hist'])
+        self.rho = None if np.isnan(state['ls_rho']) else state['ls_rho']
+        return
@@ -0,0 +1,154 @@
+"""
+author: Fabian Schaipp
+
+Multi-start driver for SQP-GS. The starts are distributed over a process pool and collected in completion order.
+"""
+
+import time
+import numpy as np
+import multiprocessing
+
+from .sqpgs import SQP_GS
+
+def constraint_violation(x, gI, gE):
+    """
+    maximal violation of the constraints at x, i.e. max(max(g_I(x), 0), |g_E(x)|)
+    """
+    vals = [np.maximum(g.eval(x), 0) for g in gI] + [np.abs(g.eval(x)) for g in gE]
+    if len(vals) == 0:
+        return 0.
+    return float(np.max(np.hstack(vals)))
+
+def _run_start(f, gI, gE, x0, seed, solver_kwargs):
+    """
+    worker function: runs SQP-GS from x0 and returns the statistics of this start
+    seed is the np.random.SeedSequence of this start
+    """
+    t0 = time.perf_counter()
+    x_k, x_hist, _, info = SQP_GS(f, gI, gE, x0, return_info = True, rng = np.random.default_rng(seed), **solver_kwargs)
+    t1 = time.perf_counter()
+
+    res = {'x0': x0, 'x': x_k, 'x_hist': x_hist, 'f': float(np.squeeze(f.eval(x_k))), 'viol': constraint_violation(x_k, gI, gE),
+           'status': info['status'], 'n_iter': info['n_iter'], 'E_k': info['E_k'], 'time': t1-t0}
+    return res
+
+def _run_indexed(args):
+    # imap_unordered passes one argument and does not tell which start a result belongs to
+    i = args[0]
+    t0 = time.perf_counter()
+    try:
+        return i, _run_start(*args[1:])
+    except Exception as e:
+        # an exception of the oracle (or an assertion of SQP_GS) only ends this start, the message is kept
+        # as a string, as the exception itself may not be picklable
+        res = {'x0': args[4], 'x': None, 'x_hist': None, 'f': np.nan, 'viol': np.nan, 'status': 'failed', 'n_iter': None,
+               'E_k': np.nan, 'time': time.perf_counter()-t0, 'error': f"{type(e).__name__}: {e}"}
+        return i, res
+
+def multistart(f, gI, gE, x0 = None, n_starts = 20, n_workers = None, target_f = None, feas_tol = 1e-6, time_budget = None, seed = None, **solver_kwargs):
+    """
+    Runs SQP-GS from several starting points in parallel (one process per start).
+
+    Parameters
+    ----------
+    f : function object
+        objective.
+    gI : list
+        inequality constraints.
+    gE : list
+        equality constraints.
+    x0 : array, optional
+        Starting points of shape (n_starts, dim). If None, n_starts standard normal points are drawn.
+    n_starts : int, optional
+        Number of starts, only used if x0 is None. The default is 20.
+    n_workers : int, optional
+        Number of worker processes. The default is None (number of CPUs).
+    target_f : float, optional
+        If a start returns a point with objective <= target_f and violation <= feas_tol, all remaining starts are stopped.
+        The default is None (no early stopping).
+    feas_tol : float, optional
+        Tolerance on the constraint violation for a point to count as feasible. The default is 1e-6.
+    time_budget : float, optional
+        Wall-clock budget in seconds. After it runs out, all remaining starts are stopped. The default is None.
+    seed : int, optional
+        Seed for generating the starting points and the independent random streams of the starts.
+    **solver_kwargs :
+        Passed to SQP_GS (e.g. tol, max_iter). verbose defaults to False. rng is not allowed, every start gets its own
+        random stream derived from seed.
+
+    Returns
+    -------
+    summary : dict
+        'x', 'f', 'viol': best solution (the feasible point with lowest objective, otherwise the least infeasible point).
+            None, nan and nan if no start finished (without error).
+        'best_start': index of the best start (None if no start finished).
+        'starts': list of per-start statistics in completion order. A start which raised an exception has status 
+            'failed' and the error message in 'error'.
+        'start_status': for every start 'completed', 'failed' or 'cancelled'.
+        'n_completed', 'n_failed', 'n_cancelled': number of finished, failed and cancelled starts.
+        'stopped_by': None, 'target' or 'time_budget'.
+        'time': total wall time.
+
+    Notes
+    -----
+    When the target or the budget is reached, the worker processes are terminated, i.e. also the starts which are
+    already running are stopped.
+    """
+    if 'rng' in solver_kwargs:
+        raise ValueError("rng can not be passed to multistart, use seed (every start gets its own random stream)")
+    solver_kwargs.setdefault('verbose', False)
+
+    ss = np.random.SeedSequence(seed)
+    if x0 is None:
+        x0 = np.random.default_rng(ss).standard_normal((n_starts, f.dim))
+    else:
+        x0 = np.atleast_2d(x0)
+    n_starts = x0.shape[0]
+    seeds = ss.spawn(n_starts)
+
+    t0 = time.perf_counter()
+    starts = list()
+    stopped_by = None
+
+    pool = multiprocessing.Pool(processes = n_workers)
+    results = pool.imap_unordered(_run_indexed, [(i, f, gI, gE, x0[i], seeds[i], solver_kwargs) for i in range(n_starts)])
+
+    try:
+        for j in range(n_starts):
+            timeout = None if time_budget is None else max(time_budget - (time.perf_counter()-t0), 0)
+            i, res = results.next(timeout = timeout)
+            res['start'] = i
+            starts.append(res)
+
+            if (target_f is not None) and (res['f'] <= target_f) and (res['viol'] <= feas_tol):
+                stopped_by = 'target'
+                break
+    except multiprocessing.TimeoutError:
+        stopped_by = 'time_budget'
+    finally:
+        if stopped_by is None:
+            pool.close()
+        else:
+            # stops the running starts as well
+            pool.terminate()
+        pool.join()
+
+    start_status = np.array(['cancelled'] * n_starts, dtype = object)
+    for r in starts:
+        start_status[r['start']] = 'failed' if r['status'] == 'failed' else 'completed'
+    finished = [r for r in starts if r['status'] != 'failed']
+
+    feasible = [r for r in finished if r['viol'] <= feas_tol]
+    if len(feasible) > 0:
+        best = min(feasible, key = lambda r: r['f'])
+    elif len(finished) > 0:
+        best = min(finished, key = lambda r: r['viol'])
+    else:
+        best = {'x': None, 'f': np.nan, 'viol': np.nan, 'start': None}
+
+    summary = {'x': best['x'], 'f': best['f'], 'viol': best['viol'], 'best_start': best['start'], 'starts': starts,
+               'start_status': list(start_status), 'n_completed': len(finished), 'n_failed': len(starts) - len(finished),
+               'n_cancelled': n_starts - len(starts),
+               'stopped_by': stopped_by, 'time': time.perf_counter()-t0}
+
+    return summary
@@ -0,0 +1,297 @@
+"""
+author: Fabian Schaipp
+
+Function objects which are evaluated by a separate (model-serving) process. One request carries all points of a batch,
+e.g. all sample points of one iteration, so the number of round trips per function and iteration does not grow with
+the number of samples.
+
+Wire format (all integers big-endian):
+    request  : magic b'NCO1' | op (uint8) | len(name) (uint16) | name (utf-8) | array
+    response : status (uint8, 0 = ok) | array            (status 0)
+                                      | len (uint32) | message (utf-8)   (otherwise)
+    array    : ndim (uint8) | shape (ndim x uint64) | data (float64, little-endian, C-order)
+ops are OP_EVAL, OP_GRAD (rows of the array are points), OP_EVAL_GRAD (values and Jacobians in one response of shape
+N x dimOut x (1+dim), the values are in [:,:,0]) and OP_INFO (returns [dim, dimOut], the array is empty).
+
+OracleServer is a small stand-in server using only the standard library (and numpy), for tests and benchmarks.
+"""
+
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import numpy as np
+
+from .sqpgs import eval_rows
+
+MAGIC = b'NCO1'
+OP_EVAL = 0
+OP_GRAD = 1
+OP_INFO = 2
+OP_EVAL_GRAD = 3
+
+#%% framing
+
+def _recv_exact(sock, n):
+    buf = bytearray(n)
+    view = memoryview(buf)
+    pos = 0
+    while pos < n:
+        k = sock.recv_into(view[pos:], n - pos)
+        if k == 0:
+            raise ConnectionError("connection closed")
+        pos += k
+    return bytes(buf)
+
+def _pack_array(A):
+    A = np.ascontiguousarray(A, dtype = '<f8')
+    return struct.pack('!B%dQ' % A.ndim, A.ndim, *A.shape) + A.tobytes()
+
+def _recv_array(sock):
+    ndim, = struct.unpack('!B', _recv_exact(sock, 1))
+    shape = struct.unpack('!%dQ' % ndim, _recv_exact(sock, 8*ndim))
+    n = int(np.prod(shape))
+    return np.frombuffer(_recv_exact(sock, 8*n), dtype = '<f8').reshape(shape)
+
+def _connect(address, timeout):
+    if isinstance(address, str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.settimeout(timeout)
+    sock.connect(address)
+    return sock
+
+#%% client
+
+class ConnectionPool:
+    """
+    thread-safe pool of persistent connections to address ((host, port) for TCP, str for a unix socket)
+    """
+    def __init__(self, address, size = 4, timeout = 60.):
+        self.address = address
+        self.size = size
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize = size)
+
+    def request(self, payload):
+        """
+        sends payload and returns the received array, on a broken pooled connection the request is retried once
+        """
+        for attempt in range(2):
+            try:
+                sock = self._pool.get_nowait()
+                fresh = False
+            except queue.Empty:
+                sock = _connect(self.address, self.timeout)
+                fresh = True
+
+            try:
+                sock.sendall(payload)
+                status, = struct.unpack('!B', _recv_exact(sock, 1))
+                if status == 0:
+                    result = _recv_array(sock)
+                else:
+                    n, = struct.unpack('!I', _recv_exact(sock, 4))
+                    result = RuntimeError("remote oracle failed: " + _recv_exact(sock, n).decode())
+            except (ConnectionError, OSError):
+                sock.close()
+                if fresh or attempt == 1:
+                    raise
+                continue
+
+            try:
+                self._pool.put_nowait(sock)
+            except queue.Full:
+                sock.close()
+
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+class RemoteFunction:
+    """
+    function object (eval, grad, eval_batch, grad_batch, dim, dimOut) evaluated by an OracleServer
+    eval_grad_batch returns values and Jacobians in one round trip, SQP_GS uses it for the sample points
+
+    Parameters
+    ----------
+    address : tuple or str
+        (host, port) or path of a unix socket.
+    name : str
+        name of the function on the server.
+    pool_size : int, optional
+        maximal number of idle connections kept open. The default is 4.
+    timeout : float, optional
+        socket timeout in seconds. The default is 60.
+    """
+    def __init__(self, address, name, pool_size = 4, timeout = 60.):
+        self.name = name
+        self.address = address
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._pool = ConnectionPool(address, pool_size, timeout)
+        # number of round trips
+        self.n_requests = 0
+
+        dim, self.dimOut = [int(v) for v in self._request(OP_INFO, np.zeros(0))]
+        if dim >= 0:
+            self.dim = dim
+        return
+
+    def __getstate__(self):
+        # connections cannot be pickled (e.g. for ncopt.multistart), they are reopened on demand
+        state = self.__dict__.copy()
+        del state['_pool']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._pool = ConnectionPool(self.address, self.pool_size, self.timeout)
+
+    def _request(self, op, X):
+        name = self.name.encode()
+        payload = MAGIC + struct.pack('!BH', op, len(name)) + name + _pack_array(X)
+        self.n_requests += 1
+        return self._pool.request(payload)
+
+    def eval_batch(self, X):
+        return self._request(OP_EVAL, X)
+
+    def grad_batch(self, X):
+        return self._request(OP_GRAD, X)
+
+    def eval_grad_batch(self, X):
+        VD = self._request(OP_EVAL_GRAD, X)
+        # contiguous copies, as returned by eval_batch and grad_batch
+        return np.ascontiguousarray(VD[:,:,0]), np.ascontiguousarray(VD[:,:,1:])
+
+    def eval(self, x):
+        v = self.eval_batch(x[np.newaxis,:])[0]
+        return v[0] if self.dimOut == 1 else v
+
+    def grad(self, x):
+        D = self.grad_batch(x[np.newaxis,:])[0]
+        return D[0] if self.dimOut == 1 else D
+
+    def close(self):
+        self._pool.close()
+
+#%% server
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sock = self.request
+        funs = self.server.funs
+        while True:
+            try:
+                # a closed connection ends the handler
+                if _recv_exact(sock, 4) != MAGIC:
+                    return
+                op, n = struct.unpack('!BH', _recv_exact(sock, 3))
+                name = _recv_exact(sock, n).decode()
+                X = _recv_array(sock)
+            except (ConnectionError, OSError):
+                return
+
+            try:
+                fun = funs[name]
+                if op == OP_EVAL:
+                    out = eval_rows(fun, X)
+                elif op == OP_GRAD:
+                    out = _grad_rows(fun, X)
+                elif op == OP_EVAL_GRAD:
+                    out = np.concatenate((eval_rows(fun, X)[:,:,np.newaxis], _grad_rows(fun, X)), axis = 2)
+                elif op == OP_INFO:
+                    out = np.array([getattr(fun, 'dim', -1), fun.dimOut], dtype = float)
+                else:
+                    raise ValueError(f"unknown op {op}")
+                response = struct.pack('!B', 0) + _pack_array(out)
+            except Exception as e:
+                msg = f"{type(e).__name__}: {e}".encode()
+                response = struct.pack('!BI', 1, len(msg)) + msg
+
+            sock.sendall(response)
+
+def _grad_rows(fun, X):
+    if hasattr(fun, 'grad_batch'):
+        return np.reshape(fun.grad_batch(X), (X.shape[0], fun.dimOut, X.shape[1]))
+    D = np.zeros((X.shape[0], fun.dimOut, X.shape[1]))
+    for i in np.arange(X.shape[0]):
+        D[i] = fun.grad(X[i])
+    return D
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def server_bind(self):
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        super().server_bind()
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+class OracleServer:
+    """
+    serves function objects to RemoteFunction clients, one thread per connection
+
+    Parameters
+    ----------
+    funs : dict
+        name --> function object.
+    address : tuple or str, optional
+        (host, port) or path of a unix socket. The default is ('127.0.0.1', 0), i.e. a free port.
+
+    Usage:
+        with OracleServer({'max': g_max()}) as server:
+            g = RemoteFunction(server.address, 'max')
+    """
+    def __init__(self, funs, address = ('127.0.0.1', 0)):
+        if isinstance(address, str):
+            self._server = _UnixServer(address, _Handler)
+        else:
+            self._server = _TCPServer(address, _Handler)
+        self._server.funs = funs
+        self.address = self._server.server_address
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target = self._server.serve_forever, daemon = True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+if __name__ == '__main__':
+    import argparse
+    from .funs import f_rosenbrock, g_max
+
+    parser = argparse.ArgumentParser(prog = 'python -m ncopt.remote', description = 'Serves the example functions of ncopt.funs.')
+    parser.add_argument('--host', default = '127.0.0.1')
+    parser.add_argument('--port', type = int, default = 5555)
+    args = parser.parse_args()
+
+    server = OracleServer({'rosenbrock': f_rosenbrock(), 'max': g_max()}, (args.host, args.port))
+    print(f"serving on {server.address}")
+    server._server.serve_forever()
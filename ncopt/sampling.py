@@ -0,0 +1,84 @@
+"""
+author: Fabian Schaipp
+
+Sampling in the eps-ball around the current iterate. All randomness comes from a np.random.Generator, so runs are
+reproducible (and independent streams for parallel runs can be spawned from a np.random.SeedSequence).
+"""
+
+import numpy as np
+
+SAMPLING_METHODS = ['random', 'sobol']
+
+def _sobol(n, d, rng):
+    """
+    n points of a scrambled Sobol sequence in [0,1)^d, scrambling is drawn from rng
+    """
+    try:
+        from scipy.stats import qmc
+    except ImportError:
+        raise ImportError("Sobol sampling requires scipy.")
+
+    import warnings
+    with warnings.catch_warnings():
+        # balance properties are only guaranteed for powers of two, we use the sequence anyway
+        warnings.simplefilter("ignore", category = UserWarning)
+        U = qmc.Sobol(d, scramble = True, seed = rng).random(n)
+
+    return U
+
+def unit_ball(shape, dim, rng, method = 'random'):
+    """
+    points uniformly distributed in the dim-dimensional unit ball
+
+    For method = 'random', we use that dropping the last two coordinates of a uniform point on the (dim+1)-sphere gives
+    a uniform point in the dim-ball. Hence, only one call to the normal generator is needed.
+    For method = 'sobol', a scrambled Sobol sequence in [0,1)^(dim+1) is mapped to the ball (first dim coordinates for
+    the direction via the inverse normal cdf, last coordinate for the radius).
+
+    Returns
+    -------
+    array of shape shape + (dim,)
+    """
+    n = int(np.prod(shape))
+
+    if method == 'random':
+        V = rng.standard_normal((n, dim+2))
+        Z = V[:,:dim] / np.linalg.norm(V, axis = 1)[:,np.newaxis]
+
+    elif method == 'sobol':
+        from scipy.special import ndtri
+        U = _sobol(n, dim+1, rng)
+        U = np.clip(U, 1e-12, 1-1e-12)
+        G = ndtri(U[:,:dim])
+        R = U[:,dim]**(1/dim)
+        Z = (R/np.linalg.norm(G, axis = 1))[:,np.newaxis] * G
+
+    else:
+        raise ValueError(f"Unknown sampling method {method}, choose from {SAMPLING_METHODS}.")
+
+    return Z.reshape(tuple(shape) + (dim,))
+
+def sample_points(x, eps, N, rng = None, method = 'random'):
+    """
+    sample N points uniformly distributed in eps-ball around x
+
+    x can also be an array of shape (B, dim) with eps of shape (B,), then N points are sampled around every row of x
+
+    Parameters
+    ----------
+    rng : np.random.Generator, int or None
+        Source of randomness, passed to np.random.default_rng.
+    method : str
+        'random' or 'sobol' (low-discrepancy, requires scipy).
+
+    Returns
+    -------
+    array of shape (N, dim), or (B, N, dim)
+    """
+    rng = np.random.default_rng(rng)
+    x = np.asarray(x)
+    eps = np.asarray(eps)
+
+    Z = unit_ball(x.shape[:-1] + (N,), x.shape[-1], rng, method)
+
+    return x[...,np.newaxis,:] + eps[...,np.newaxis,np.newaxis] * Z
@@ -4,32 +4,57 @@ author: Fabian Schaipp
 Notation is (wherever possible) inspired by Curtis, Overton "SQP FOR NONSMOOTH CONSTRAINED OPTIMIZATION"
 """
 
+import time
 import numpy as np
-import cvxopt as cx
-    
-def sample_points(x, eps, N):
+
+from .sampling import sample_points
+from .checkpoint import save_checkpoint, load_checkpoint, rng_state, rng_from_state
+from .linesearch import LineSearch
+
+
+def stack_blocks(blocks, width = None):
     """
-    sample N points uniformly distributed in eps-ball around x
+    stacks the blocks of all constraint components (e.g. D_gI, a list of arrays with 1+p_j rows each) into one array
+    
+    Returns
+    -------
+    array with the rows of all blocks, start index of every block
+    width is the number of columns of the stacked array if blocks is empty (None for 1d-blocks)
     """
-    dim = len(x)
-    U = np.random.randn(N, dim)
-    norm_U = np.linalg.norm(U, axis = 1)
-    R = np.random.rand(N)**(1/dim)    
-    Z = eps * (R/norm_U)[:,np.newaxis] * U
+    if len(blocks) == 0:
+        return np.zeros((0,) if width is None else (0, width)), np.zeros(0, dtype = int)
     
-    return x + Z
+    starts = np.cumsum([0] + [len(b) for b in blocks[:-1]])
+    return np.concatenate(blocks, axis = 0), starts
 
+def block_max(v, starts):
+    """
+    maximum of v over each block, v is stacked with stack_blocks
+    """
+    if len(starts) == 0:
+        return np.zeros(0)
+    return np.maximum.reduceat(v, starts)
 
 def q_rho(d, rho, H, f_k, gI_k, gE_k, D_f, D_gI, D_gE):
+    """
+    model of the merit function phi_rho at x_k + d (objective of the direction QP)
+    D_gI, D_gE are lists of blocks (one per component) or tuples (stacked array, start indices) from stack_blocks
+    """
+    dim = len(d)
+    G_I, starts_I = D_gI if isinstance(D_gI, tuple) else stack_blocks(D_gI, dim)
+    G_E, starts_E = D_gE if isinstance(D_gE, tuple) else stack_blocks(D_gE, dim)
+    
     term1 = rho* (f_k + np.max(D_f @ d))
     
-    term2 = 0
-    for j in np.arange(len(D_gI)):
-        term2 += np.maximum(gI_k[j] + D_gI[j] @ d, 0).max()
+    # component j is linearized at every row of its block, gI_k[j] is repeated accordingly
+    term2 = np.maximum(block_max(G_I @ d, starts_I) + gI_k, 0).sum() if len(starts_I) > 0 else 0
     
-    term3 = 0
-    for l in np.arange(len(D_gE)):
-        term2 += np.abs(gE_k[l] + D_gE[l] @ d).max()
+    # every row of an equality block has the same value gE_k[l], hence max |gE_k[l] + D d| = max(gE_k[l] + max(D d), -gE_k[l] - min(D d))
+    if len(starts_E) > 0:
+        v = G_E @ d
+        term3 = np.maximum(gE_k + block_max(v, starts_E), -gE_k + block_max(-v, starts_E)).sum()
+    else:
+        term3 = 0
     
     term4 = 0.5 * d@H@d
     
@@ -51,9 +76,65 @@ def phi_rho(x, f, gI, gE, rho):
         
     return term1+term2+term3
 
-def stop_criterion(gI, gE, g_k, SP, gI_k, gE_k, B_gI, B_gE, nI_, nE_, pI, pE):
+def phi_rho_rows(X, f, gI, gE, rho):
+    """
+    evaluates phi_rho at all rows of X, with one (batched) call per function object
+    """
+    if X.shape[0] == 1:
+        return np.array([phi_rho(X[0], f, gI, gE, rho)])
+    
+    phi = rho * eval_rows(f, X)[:,0]
+    for g in gI:
+        phi += np.maximum(eval_rows(g, X), 0).sum(axis = 1)
+    for g in gE:
+        phi += np.abs(eval_rows(g, X)).sum(axis = 1)
+    
+    return phi
+
+def component_blocks(arrays, width = None):
+    """
+    stacks sampled values (arrays of shape N x dimOut) or Jacobians (N x dimOut x dim) of several function objects 
+    component by component, i.e. in the layout of stack_blocks (one block with N rows per component)
+    a single array with N = 1 (e.g. a constant Jacobian) is not copied
+    
+    Returns
+    -------
+    stacked array, start index of every block
+    width is the number of columns of the stacked array if arrays is empty (None for values)
+    """
+    if len(arrays) == 0:
+        return np.zeros((0,) if width is None else (0, width)), np.zeros(0, dtype = int)
+    
+    rows = [np.swapaxes(A, 0, 1).reshape((-1,) + A.shape[2:]) for A in arrays]
+    counts = np.concatenate([np.full(A.shape[1], A.shape[0], dtype = int) for A in arrays])
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(int)
+    
+    return (rows[0] if len(rows) == 1 else np.concatenate(rows, axis = 0)), starts
+
+def block_multipliers(lam, V):
+    """
+    multipliers lam (one block per component) expanded to the rows of V (one block of sample values per component)
+    
+    A component with constant gradient has a single multiplier (its Jacobian appears once in the QP). With one row per
+    sample point, the rows would be identical and the interior-point solution splits the multiplier evenly among them,
+    hence lambda/(1+p) is used at every sample point.
+    """
+    lam, starts_l = lam if isinstance(lam, tuple) else stack_blocks(lam)
+    V, starts_v = V if isinstance(V, tuple) else stack_blocks(V)
+    
+    n_l = np.diff(np.append(starts_l, len(lam)))
+    n_v = np.diff(np.append(starts_v, len(V)))
+    rep = np.repeat(n_v // n_l, n_l)
+    
+    return np.repeat(lam / rep, rep), V
+
+def stop_criterion(g_k, gI_k, gE_k, lambda_gI, lambda_gE, V_gI, V_gE):
     """
     computes E_k in the paper
+    
+    lambda_gI, lambda_gE are the multipliers of the constraint components (e.g. SP.lambda_gI), V_gI, V_gE their values 
+    at the sample points, i.e. the values computed in the sampling phase. All four are lists of blocks (one per 
+    component) or tuples (stacked array, start indices), see block_multipliers for components with constant gradient.
     """
     val1 = np.linalg.norm(g_k, np.inf)
     
@@ -61,37 +142,41 @@ def stop_criterion(gI, gE, g_k, SP, gI_k, gE_k, B_gI, B_gE, nI_, nE_, pI, pE):
     val2 = np.max(gI_k, initial = -np.inf)
     val3 = np.max(np.abs(gE_k), initial = -np.inf)
     
-    gI_vals = list()
-    for j in np.arange(nI_):
-        gI_vals += eval_ineq(gI[j], B_gI[j])
-    
-    val4 = -np.inf
-    for j in np.arange(len(gI_vals)):
-        val4 = np.maximum(val4, np.max(SP.lambda_gI[j] * gI_vals[j]))
-    
-    gE_vals = list()
-    for j in np.arange(nE_):
-        gE_vals += eval_ineq(gE[j], B_gE[j])
-    
-    val5 = -np.inf
-    for j in np.arange(len(gE_vals)):
-        val5 = np.maximum(val5, np.max(SP.lambda_gE[j] * gE_vals[j]))
+    # complementarity, over all samples of all components at once
+    lam, V = block_multipliers(lambda_gI, V_gI)
+    val4 = np.max(lam * V, initial = -np.inf)
+    lam, V = block_multipliers(lambda_gE, V_gE)
+    val5 = np.max(lam * V, initial = -np.inf)
     
     return np.max(np.array([val1, val2, val3, val4, val5]))
 
+def eval_rows(fun, X):
+    """
+    evaluates fun at every row of X, using fun.eval_batch if it exists
+
+    Returns
+    -------
+    array of shape (N, dimOut)
+    """
+    if hasattr(fun, 'eval_batch'):
+        return np.asarray(fun.eval_batch(X)).reshape(X.shape[0], -1)
+
+    V = np.zeros((X.shape[0], fun.dimOut), dtype = X.dtype)
+    for i in np.arange(X.shape[0]):
+        V[i,:] = fun.eval(X[i,:])
+    return V
+
 def eval_ineq(fun, X):
     """
     evaluate function at multiple inputs
-    needed in stop_criterion
+    not used by the solver any more (see eval_rows), kept for backward compatibility
+    uses fun.eval_batch(X) if available
     
     Returns
     -------
     list of array, number of entries = fun.dimOut 
     """
-    (N, _) = X.shape
-    D = np.zeros((N, fun.dimOut))
-    for i in np.arange(N):
-        D[i,:,] = fun.eval(X[i,:])
+    D = eval_rows(fun, X)
     
     return [D[:,j] for j in range(fun.dimOut)]
 
@@ -99,29 +184,131 @@ def eval_ineq(fun, X):
 def compute_gradients(fun, X):
     """ 
     computes gradients of function object f at all rows of array X
+    if fun.constant_grad is True, fun.grad is called once
+    uses fun.grad_batch(X) if available, which returns all Jacobians as array of shape N x dimOut x dim
     
     Returns
     -------
-    list of 2d-matrices, length of fun.dimOut
+    array of shape N x dimOut x dim, D[:,j,:] are the gradients of component j
     """
     (N, dim) = X.shape
     
+    if getattr(fun, 'constant_grad', False):
+        # one Jacobian for all rows (read-only view, no copies)
+        return np.broadcast_to(np.reshape(fun.grad(X[0,:]), (1, fun.dimOut, dim)), (N, fun.dimOut, dim))
+    
+    if hasattr(fun, 'grad_batch'):
+        return np.asarray(fun.grad_batch(X)).reshape(N, fun.dimOut, dim)
+    
     # fun.grad returns Jacobian, i.e. dimOut x dim
     D = np.zeros((N, fun.dimOut, dim))
     for i in np.arange(N):
         D[i,:,:] = fun.grad(X[i,:])
     
-    D_list = list()
-    for j in np.arange(fun.dimOut):
-        D_list.append(D[:,j,:])
+    return D
+
+
+def sample_values(fun, B):
+    """
+    evaluates function at the sampled points B, where B[0,:] = x_k
+    function objects with a method eval_samples(B) (e.g. ncopt.surrogate.SurrogateConstraint) can treat x_k 
+    differently from the other samples
+    
+    Returns
+    -------
+    array of shape N x dimOut
+    """
+    if hasattr(fun, 'eval_samples'):
+        return np.reshape(fun.eval_samples(B), (B.shape[0], fun.dimOut))
+    
+    return eval_rows(fun, B)
+
+def sample_gradients(fun, B):
+    """
+    computes gradients at the sampled points B, where B[0,:] = x_k
+    function objects with a method grad_samples(B) (e.g. ncopt.surrogate.SurrogateConstraint) can treat x_k 
+    differently from the other samples
+    
+    Returns
+    -------
+    array of shape N x dimOut x dim
+    """
+    if hasattr(fun, 'grad_samples'):
+        return np.reshape(fun.grad_samples(B), (B.shape[0], fun.dimOut, B.shape[1]))
+    
+    return compute_gradients(fun, B)
+
+def sample_values_gradients(fun, B, constant_grad = False):
+    """
+    values and gradients at the sampled points B (see sample_values and sample_gradients), 
+    for constant_grad = True the gradients only at B[0,:] = x_k
+    function objects with a method eval_grad_batch(X) (e.g. ncopt.remote.RemoteFunction) return both in one call
+    
+    Returns
+    -------
+    arrays of shape N x dimOut and N x dimOut x dim (1 x dimOut x dim for constant_grad = True)
+    """
+    (N, dim) = B.shape
+    
+    if hasattr(fun, 'eval_grad_batch') and not constant_grad \
+        and not (hasattr(fun, 'eval_samples') or hasattr(fun, 'grad_samples')):
+        V, D = fun.eval_grad_batch(B)
+        return np.reshape(V, (N, fun.dimOut)), np.reshape(D, (N, fun.dimOut, dim))
+    
+    return sample_values(fun, B), sample_gradients(fun, B[:1] if constant_grad else B)
+
+
+def qp_tolerances(eps, E_k, nu = 10):
+    """
+    cvxopt options for an inexact solve of the direction QP
+    
+    A step is taken if delta_q > nu*eps**2, hence the QP only needs to be accurate relative to this threshold 
+    (and relative to the current stationarity measure E_k). While eps and E_k are large, the tolerances are loose; 
+    they tighten to the cvxopt defaults as eps and E_k go to zero. The number of iterations is not limited.
+    """
+    target = min(nu*eps**2, E_k)
+    
+    options = {'abstol': float(np.clip(1e-2*target, 1e-7, 1e-3)),
+               'reltol': float(np.clip(1e-2*target, 1e-6, 1e-3)),
+               'feastol': float(np.clip(1e-3*target, 1e-7, 1e-6))}
+    return options
+
+
+def update_hessian(s_hist, y_hist, eps, xi_s = 1e3, xi_y = 1e3, xi_sy = 1e-6):
+    """
+    limited-memory BFGS approximation of the Hessian, starting from the identity
+    
+    s_hist, y_hist : arrays of shape dim x iter_H, the most recent pair is in the first column
+    only pairs satisfying the safeguards from the paper (depending on eps) are used
+    """
+    (dim, iter_H) = s_hist.shape
     
-    return D_list   
+    hH = np.eye(dim)
+    for l in np.arange(iter_H):
+        sl = s_hist[:,l]
+        yl = y_hist[:,l]
+        
+        cond = (np.linalg.norm(sl) <= xi_s*eps) and (np.linalg.norm(yl) <= xi_y*eps) and (np.inner(sl,yl) >= xi_sy*eps**2)
+        
+        if cond:
+            Hs = hH@sl
+            hH = hH - np.outer(Hs,Hs)/(sl @ Hs + 1e-16) + np.outer(yl,yl)/(yl @ sl + 1e-16)
+        
+    assert np.all(np.abs(hH - hH.T) <= 1e-8), f"{hH}"
 
+    # rounding errors can make hH (nearly) singular or indefinite, the QP is then degenerate: restart from the identity
+    ev = np.linalg.eigvalsh(hH)
+    if ev[0] <= 1e-8 * ev[-1]:
+        return np.eye(dim)
 
+    return hH
 
-def SQP_GS(f, gI, gE, x0 = None, tol = 1e-8, max_iter = 100, verbose = True, assert_tol = 1e-5):
+
+def SQP_GS(f, gI, gE, x0 = None, tol = 1e-8, max_iter = 100, verbose = True, assert_tol = 1e-5, return_info = False, rng = None, sampling = 'random', n_samples = (2, 3, 4),
+           checkpoint = None, checkpoint_every = 10, resume = None, adaptive_qp = False, line_search = None):
     """
     each element of gI, gE needs attribute g.dimOut 
+    if g.constant_grad is True (e.g. linear constraints), g is sampled only at x_k, i.e. its Jacobian appears once in the QP
 
     Parameters
     ----------
@@ -139,6 +326,28 @@ def SQP_GS(f, gI, gE, x0 = None, tol = 1e-8, max_iter = 100, verbose = True, ass
         DESCRIPTION. The default is 100.
     verbose : TYPE, optional
         DESCRIPTION. The default is True.
+    return_info : bool, optional
+        If True, additionally return a dictionary with run statistics. The default is False.
+    rng : np.random.Generator, int or None, optional
+        Source of randomness for the sampling. Pass a seed or a Generator for reproducible runs. The default is None.
+    sampling : str, optional
+        'random' or 'sobol' (scrambled low-discrepancy sampling, requires scipy). The default is 'random'.
+    n_samples : tuple, optional
+        Number of sample points (excluding x_k) for f, for each inequality and for each equality function object. 
+        Low-discrepancy sampling may need fewer points. The default is (2, 3, 4).
+    checkpoint : str, optional
+        If given, the solver state is written to this file every checkpoint_every iterations. The default is None.
+    checkpoint_every : int, optional
+        The default is 10.
+    resume : str, optional
+        Checkpoint file to resume from. The run continues exactly where the checkpoint was written (x0 and rng are ignored),
+        max_iter counts the iterations of the original run. The default is None.
+    adaptive_qp : bool, optional
+        If True, the direction QP is solved inexactly with tolerances depending on eps and E_k (see qp_tolerances).
+        If the inexact direction does not decrease the model (delta_q < 0), the QP is solved again exactly. The default is False.
+    line_search : LineSearch, optional
+        step size rule, e.g. LineSearch(memory = 5) for a nonmonotone rule or LineSearch(ladder = 4) for evaluating
+        several step sizes at once (see ncopt/linesearch.py). The default is None, i.e. the Armijo rule LineSearch().
 
     Returns
     -------
@@ -148,6 +357,9 @@ def SQP_GS(f, gI, gE, x0 = None, tol = 1e-8, max_iter = 100, verbose = True, ass
         DESCRIPTION.
     SP : TYPE
         DESCRIPTION.
+    info : dict
+        Only if return_info = True. Contains status, number of iterations, final E_k, eps, rho, QP solver statistics
+        and the number of merit function evaluations per iteration (n_merit).
 
     """
     eps = 1e-1 # sampling radius
@@ -166,16 +378,23 @@ def SQP_GS(f, gI, gE, x0 = None, tol = 1e-8, max_iter = 100, verbose = True, ass
     nI = sum(dimI) # number of inequality costraints
     nE = sum(dimE) # number of equality costraints
     
-    p0 = 2                              # sample points for objective
-    pI_ = 3 * np.ones(nI_, dtype = int) # sample points for ineq constraint
-    pE_ = 4 * np.ones(nE_, dtype = int) # sample points for eq constraint
+    p0 = int(n_samples[0])                          # sample points for objective
+    pI_ = n_samples[1] * np.ones(nI_, dtype = int)  # sample points for ineq constraint
+    pE_ = n_samples[2] * np.ones(nE_, dtype = int)  # sample points for eq constraint
+    
+    # functions with constant_grad = True (e.g. linear) are still evaluated at all sample points (for E_k),
+    # but their Jacobian is only computed at x_k and enters the QP once
+    cI_ = np.array([getattr(g, 'constant_grad', False) for g in gI], dtype = bool)
+    cE_ = np.array([getattr(g, 'constant_grad', False) for g in gE], dtype = bool)
         
-    pI = np.repeat(pI_, dimI)
-    pE = np.repeat(pE_, dimE)
+    pI = np.repeat(np.where(cI_, 0, pI_), dimI)
+    pE = np.repeat(np.where(cE_, 0, pE_), dimE)
+    
+    # all samples of one iteration are drawn at once, function l gets the rows offsets[l]:offsets[l+1]
+    offsets = np.cumsum(np.hstack((0, p0, pI_, pE_))).astype(int)
+    rng = np.random.default_rng(rng)
       
     # parameters (set after recommendations in paper)
-    eta = 1e-8
-    gamma = 0.5
     beta_eps = 0.5
     beta_rho = 0.5
     beta_theta = 0.8
@@ -202,7 +421,34 @@ def SQP_GS(f, gI, gE, x0 = None, tol = 1e-8, max_iter = 100, verbose = True, ass
     
     H = np.eye(dim)
     
+    if line_search is None:
+        line_search = LineSearch()
+    line_search.reset()
+    # number of merit function evaluations per iteration
+    n_merit = list()
+    
     status = 'not optimal'; step = np.nan
+    start_iter = 0
+    
+    if resume is not None:
+        state = load_checkpoint(resume)
+        assert state['dim'] == dim and state['nI'] == nI and state['nE'] == nE, "Checkpoint does not match the problem dimensions."
+        # older checkpoints were written with the default sample counts
+        assert tuple(state.get('n_samples', (2, 3, 4))) == tuple(n_samples), "Checkpoint was written with other sample counts."
+        
+        start_iter = state['iter_k']
+        x_k = state['x_k']; x_hist = list(state['x_hist'])
+        eps = state['eps']; rho = state['rho']; theta = state['theta']; E_k = state['E_k']
+        H = state['H']; s_hist = state['s_hist']; y_hist = state['y_hist']
+        if state['has_prev']:
+            x_kmin1 = state['x_kmin1']; g_kmin1 = state['g_kmin1']
+        step = state['step']
+        rng = rng_from_state(state['rng'])
+        SP.n_solves = state['n_qp']; SP.qp_time = state['qp_time']; SP.qp_iter = state['qp_iter']
+        # checkpoints of older versions have no line search state
+        if 'n_merit' in state:
+            n_merit = list(state['n_merit'])
+            line_search.load_state(state)
     
     hdr_fmt = "%4s\t%10s\t%5s\t%5s\t%10s\t%10s"
     out_fmt = "%4d\t%10.4g\t%10.4g\t%10.4g\t%10.4g\t%10s"
@@ -213,7 +459,7 @@ def SQP_GS(f, gI, gE, x0 = None, tol = 1e-8, max_iter = 100, verbose = True, ass
     # START OF LOOP
     ##############################################
     
-    for iter_k in range(max_iter):
+    for iter_k in range(start_iter, max_iter):
         
         if E_k <= tol:
             status = 'optimal'
@@ -222,64 +468,68 @@ def SQP_GS(f, gI, gE, x0 = None, tol = 1e-8, max_iter = 100, verbose = True, ass
         ##############################################
         # SAMPLING
         ##############################################
-        B_f = sample_points(x_k, eps, p0)
-        B_f = np.vstack((x_k, B_f))
+        B = sample_points(x_k, eps, offsets[-1], rng, sampling)
+        
+        B_f = np.vstack((x_k, B[offsets[0]:offsets[1]]))
         
         B_gI = list()
         for j in np.arange(nI_):
-            B_j = sample_points(x_k, eps, pI_[j])
-            B_j = np.vstack((x_k, B_j))
+            B_j = np.vstack((x_k, B[offsets[1+j]:offsets[2+j]]))
             B_gI.append(B_j)
             
         B_gE = list()
         for j in np.arange(nE_):
-            B_j = sample_points(x_k, eps, pE_[j])
-            B_j = np.vstack((x_k, B_j))
+            B_j = np.vstack((x_k, B[offsets[1+nI_+j]:offsets[2+nI_+j]]))
             B_gE.append(B_j)
             
             
         ####################################
         # COMPUTE GRADIENTS AND EVALUATE
         ###################################
-        D_f = compute_gradients(f, B_f)[0] # returns list, always has one element
-        
-        D_gI = list()
-        for j in np.arange(nI_):
-            D_gI += compute_gradients(gI[j], B_gI[j])
-            
-        D_gE = list()
-        for j in np.arange(nE_):
-            D_gE += compute_gradients(gE[j], B_gE[j])
- 
-        f_k = f.eval(x_k)
-        # hstack cannot handle empty lists!
-        if nI_ > 0:
-            gI_k = np.hstack([gI[j].eval(x_k) for j in range(nI_)])
+        if hasattr(f, 'eval_grad_batch'):
+            # one call (e.g. one request of a remote oracle) for the gradients and the value at x_k = B_f[0,:]
+            V_f, D_f = sample_values_gradients(f, B_f)
+            f_k = V_f[0,0]
         else:
-            gI_k = np.array([])
+            D_f = sample_gradients(f, B_f)
+            f_k = f.eval(x_k)
+        D_f = D_f[:,0,:]
         
-        if nE_ > 0:
-            gE_k = np.hstack([gE[j].eval(x_k) for j in range(nE_)])
-        else:
-            gE_k = np.array([])
+        # Jacobians and values of all components, stacked component by component (see component_blocks)
+        VG_I = [sample_values_gradients(gI[j], B_gI[j], cI_[j]) for j in range(nI_)]
+        VG_E = [sample_values_gradients(gE[j], B_gE[j], cE_[j]) for j in range(nE_)]
+        G_I = component_blocks([D for V, D in VG_I], dim)
+        G_E = component_blocks([D for V, D in VG_E], dim)
+        V_gI = [V for V, D in VG_I]
+        V_gE = [V for V, D in VG_E]
+        
+        # the first sample point is x_k
+        gI_k = np.concatenate([V[0] for V in V_gI]) if nI_ > 0 else np.zeros(0)
+        gE_k = np.concatenate([V[0] for V in V_gE]) if nE_ > 0 else np.zeros(0)
         
         ##############################################
         # SUBPROBLEM
         ##############################################
         #print("H EIGVALS", np.linalg.eigh(H)[0])
 
-        SP.update(H, rho, D_f, D_gI, D_gE, f_k, gI_k, gE_k)
-        SP.solve()
+        SP.update(H, rho, D_f, G_I, G_E, f_k, gI_k, gE_k)
         
-        d_k = SP.d.copy()
-        # compute g_k from paper 
-        g_k = SP.lambda_f @ D_f + np.sum([SP.lambda_gI[j] @ D_gI[j] for j in range(nI)], axis = 0)  \
-                             +  np.sum([SP.lambda_gE[j] @ D_gE[j] for j in range(nE)], axis = 0)
-                                  
         # evaluate v(x) at x=x_k
         v_k = np.maximum(gI_k, 0).sum() + np.sum(np.abs(gE_k))
         phi_k = rho*f_k + v_k  
-        delta_q = phi_k - q_rho(d_k, rho, H, f_k, gI_k, gE_k, D_f, D_gI, D_gE) 
+        
+        for exact in ([False, True] if adaptive_qp else [True]):
+            options = None if exact else qp_tolerances(eps, E_k, nu)
+            SP.solve(options)
+            
+            d_k = SP.d.copy()
+            delta_q = phi_k - q_rho(d_k, rho, H, f_k, gI_k, gE_k, D_f, G_I, G_E)
+            # d = 0 is feasible for the QP with objective value phi_k, an inexact solution must not be worse (up to its duality gap)
+            if exact or delta_q >= -min(options['abstol'], assert_tol):
+                break
+        
+        # compute g_k from paper 
+        g_k = SP.lambda_f @ D_f + SP.lambda_I @ G_I[0] + SP.lambda_E @ G_E[0]
         
         assert delta_q >= -assert_tol
         assert np.abs(SP.lambda_f.sum() - rho) <= assert_tol, f"{np.abs(SP.lambda_f.sum() - rho)}"
@@ -288,7 +538,8 @@ def SQP_GS(f, gI, gE, x0 = None, tol = 1e-8, max_iter = 100, verbose = True, ass
         if verbose:
             print(out_fmt % (iter_k, f_k, np.max(np.hstack((gI_k,gE_k))), E_k, step, SP.status))
         
-        new_E_k = stop_criterion(gI, gE, g_k, SP, gI_k, gE_k, B_gI, B_gE, nI_, nE_, pI, pE)
+        new_E_k = stop_criterion(g_k, gI_k, gE_k, (SP.lambda_I, SP.starts_I), (SP.lambda_E, SP.starts_E), 
+                                 component_blocks(V_gI), component_blocks(V_gE))
         E_k = min(E_k, new_E_k)
         
         ##############################################
@@ -297,13 +548,9 @@ def SQP_GS(f, gI, gE, x0 = None, tol = 1e-8, max_iter = 100, verbose = True, ass
         
         step = delta_q > nu*eps**2 
         if step:
-            alpha = 1.
-            phi_new = phi_rho(x_k + alpha*d_k, f, gI, gE, rho)
-            
-            # Armijo step size rule
-            while phi_new > phi_k - eta*alpha*delta_q:                
-                alpha *= gamma
-                phi_new = phi_rho(x_k + alpha*d_k, f, gI, gE, rho)
+            merit = lambda X: phi_rho_rows(X, f, gI, gE, rho)
+            alpha, phi_new, n_eval = line_search.search(merit, x_k, d_k, phi_k, delta_q, rho)
+            n_merit.append(n_eval)
                 
             # update Hessian
             if x_kmin1 is not None:
@@ -315,20 +562,7 @@ def SQP_GS(f, gI, gE, x0 = None, tol = 1e-8, max_iter = 100, verbose = True, ass
                 y_hist = np.roll(y_hist, 1, axis = 1)
                 y_hist[:,0] = y_k
                                 
-                hH = np.eye(dim)
-                for l in np.arange(iter_H):
-                    sl = s_hist[:,l]
-                    yl = y_hist[:,l]
-                    
-                    cond = (np.linalg.norm(sl) <= xi_s*eps) and (np.linalg.norm(yl) <= xi_y*eps) and (np.inner(sl,yl) >= xi_sy*eps**2)
-                    
-                    if cond:
-                        Hs = hH@sl
-                        hH = hH - np.outer(Hs,Hs)/(sl @ Hs + 1e-16) + np.outer(yl,yl)/(yl @ sl + 1e-16)
-                    
-                assert np.all(np.abs(hH - hH.T) <= 1e-8), f"{H}"
-                
-                H = hH.copy()
+                H = update_hessian(s_hist, y_hist, eps, xi_s, xi_y, xi_sy)
                 
             ####################################
             # ACTUAL STEP
@@ -342,6 +576,9 @@ def SQP_GS(f, gI, gE, x0 = None, tol = 1e-8, max_iter = 100, verbose = True, ass
         # NO STEP
         ##############################################
         else:
+            n_merit.append(0)
+            # the QP model changes (eps, theta or rho), the nonmonotone rule starts again
+            line_search.reset()
             if v_k <= theta:
                 theta *= beta_theta
             else:
@@ -351,6 +588,16 @@ def SQP_GS(f, gI, gE, x0 = None, tol = 1e-8, max_iter = 100, verbose = True, ass
         
         
         x_hist.append(x_k)
+        
+        if (checkpoint is not None) and ((iter_k+1) % checkpoint_every == 0):
+            has_prev = x_kmin1 is not None
+            save_checkpoint(checkpoint, {'iter_k': iter_k+1, 'dim': dim, 'nI': nI, 'nE': nE, 'n_samples': np.array(n_samples, dtype = int),
+                                         'x_k': x_k, 'x_hist': np.vstack(x_hist), 'eps': eps, 'rho': rho, 'theta': theta, 'E_k': E_k,
+                                         'H': H, 's_hist': s_hist, 'y_hist': y_hist, 'has_prev': has_prev,
+                                         'x_kmin1': x_kmin1 if has_prev else np.zeros(dim), 'g_kmin1': g_kmin1 if has_prev else np.zeros(dim),
+                                         'step': float(step), 'rng': rng_state(rng),
+                                         'n_qp': SP.n_solves, 'qp_time': SP.qp_time, 'qp_iter': SP.qp_iter,
+                                         'n_merit': np.array(n_merit, dtype = int), **line_search.state()})
             
     ##############################################
     # END OF LOOP
@@ -360,10 +607,189 @@ def SQP_GS(f, gI, gE, x0 = None, tol = 1e-8, max_iter = 100, verbose = True, ass
     if E_k > tol:
         status = 'max iterations reached'
     
-    print(f"SQP-GS has terminated with status {status}")
+    if verbose:
+        print(f"SQP-GS has terminated with status {status}")
+    
+    if return_info:
+        info = {'status': status, 'n_iter': len(x_hist)-1, 'E_k': E_k, 'eps': eps, 'rho': rho,
+                'n_qp': SP.n_solves, 'qp_time': SP.qp_time, 'qp_iter': SP.qp_iter, 'n_merit': np.array(n_merit, dtype = int)}
+        return x_k, x_hist, SP, info
     
     return x_k, x_hist, SP
 
+class GradientRows:
+    """
+    gradient rows of G for B direction QPs with the same structure, given as segments (see Subproblem.segments, 
+    with a leading dimension B)
+    
+    The rows are only read in chunks of about chunk_size rows (they can be memory maps), a chunk contains all rows with 
+    the same slack variable. If there are at most chunk_size rows, they are copied once into one dense array.
+    """
+    def __init__(self, segments, chunk_size = 4096):
+        self.segments = segments
+        (self.B, _, self.dim) = segments[0][0].shape
+        self.m = sum(len(slack)*len(offsets) for _, slack, offsets, _ in segments)
+        
+        # for every segment: row ranges (a, b), first row of every slack variable in the range, its index and the number
+        # of the slack variable (in the range) of every row
+        self.chunks = list()
+        for J, slack, offsets, signs in segments:
+            r = len(slack)
+            new = np.diff(slack, prepend = -1) != 0
+            first = np.flatnonzero(new)
+            group = np.cumsum(new) - 1
+            bounds = np.zeros(1, dtype = int) if r <= chunk_size else np.unique(first[np.searchsorted(first, np.arange(0, r, chunk_size), side = 'right') - 1])
+            chunks = list()
+            for a, b in zip(bounds, np.append(bounds[1:], r)):
+                first_c = first[group[a]:group[b-1]+1]
+                chunks.append((a, b, first_c - a, slack[first_c], group[a:b] - group[a]))
+            self.chunks.append(chunks)
+        
+        self.dense = None
+        if self.m <= chunk_size:
+            self.dense = np.zeros((self.B, self.m, self.dim))
+            for J, slack, offsets, signs in segments:
+                for o, sign in zip(offsets, signs):
+                    self.dense[:,o:o+len(slack)] = sign*J
+        return
+    
+    def blocks(self):
+        """
+        iterates over the chunks: contiguous copy of the rows, row offsets in G and signs, starts, slack variables and 
+        the number of the slack variable of every row (see __init__)
+        """
+        for (J, _, offsets, signs), chunks in zip(self.segments, self.chunks):
+            for a, b, starts, s_c, group in chunks:
+                yield np.ascontiguousarray(J[:,a:b]), [o+a for o in offsets], signs, starts, s_c, group
+    
+    def product(self, x):
+        """
+        products of the gradient rows with x of shape B x dim, returns an array B x m
+        """
+        if self.dense is not None:
+            return (self.dense @ x[:,:,np.newaxis])[:,:,0]
+        out = np.zeros((self.B, self.m))
+        for J_c, offsets, signs, _, _, _ in self.blocks():
+            v = (J_c @ x[:,:,np.newaxis])[:,:,0]
+            for o, sign in zip(offsets, signs):
+                out[:,o:o+J_c.shape[1]] = sign*v
+        return out
+    
+    def tproduct(self, v):
+        """
+        sum of the gradient rows weighted with v of shape B x m, returns an array B x dim
+        """
+        if self.dense is not None:
+            return (v[:,np.newaxis,:] @ self.dense)[:,0,:]
+        out = np.zeros((self.B, self.dim))
+        for J_c, offsets, signs, _, _, _ in self.blocks():
+            u = sum(sign*v[:,o:o+J_c.shape[1]] for o, sign in zip(offsets, signs))
+            out += (u[:,np.newaxis,:] @ J_c)[:,0,:]
+        return out
+
+def G_product(rows, slack, ns, x, trans = 'N'):
+    """
+    G @ x (trans = 'N', x of shape B x (dim+ns)) or G' @ x (trans = 'T', x of shape B x mG) for B QPs with G of the 
+    structure described in structured_kktsolver, rows are the GradientRows
+    """
+    (B, dim, m) = (rows.B, rows.dim, rows.m)
+    if trans == 'N':
+        out = -x[:,dim:][:,slack]
+        out[:,:m] += rows.product(x[:,:dim])
+        return out
+    ix = slack[np.newaxis,:] + ns*np.arange(B)[:,np.newaxis]
+    S = np.bincount(ix.ravel(), weights = x.ravel(), minlength = B*ns).reshape(B, ns)
+    return np.hstack((rows.tproduct(x[:,:m]), -S))
+
+def G_operator(rows, slack, ns):
+    """
+    G as a function for cvxopt.solvers.qp (y := alpha*G*x + beta*y, or with G'), see G_product
+    """
+    import cvxopt as cx
+    def G(x, y, trans = 'N', alpha = 1.0, beta = 0.0):
+        out = alpha * G_product(rows, slack, ns, np.array(x).reshape(rows.B, -1), trans).ravel()
+        if beta != 0.:
+            out += beta * np.array(y).ravel()
+        y[:] = cx.matrix(out)
+        return
+    return G
+
+def structured_kktsolver(H, rows, slack, ns, W):
+    """
+    KKT solver for cvxopt.solvers.qp, see the documentation of cvxopt.solvers.coneqp (advanced usage)
+    
+    Solves the KKT systems of B direction QPs with the same structure at once (B = 1 for Subproblem; B > 1 for a 
+    block-diagonal QP of several instances, see ncopt.batch). H has shape B x dim x dim, rows are the gradient rows 
+    of G (GradientRows), slack is the index of the -1 entry of every row of G in the ns variables (z, rI, rE).
+    
+    We need to solve (P + G' W^{-2} G) ux = bx + G' W^{-2} bz. Every row of G has its gradient entries in the 
+    columns of d and a single -1 in the column of z or of its slack variable, hence the block of (z, rI, rE) in 
+    P + G' W^{-2} G is diagonal and the system reduces to a dense dim x dim system (Schur complement). 
+    The cost is linear in the number of rows of G, apart from vectors of length mG only chunks of the rows are held 
+    in memory.
+    """
+    import cvxopt as cx
+    (B, dim, m) = (rows.B, rows.dim, rows.m)
+    mG = len(slack)
+    
+    di = np.array(W['di']).reshape(B, mG)
+    w = di**2
+    # index of the -1 entry in all (z, rI, rE) of the batch
+    ix = slack[np.newaxis,:] + ns*np.arange(B)[:,np.newaxis]
+    
+    # diagonal block of (z, rI, rE) and the weights of the rows without gradient (nonnegativity of rI, rE)
+    c = np.bincount(ix.ravel(), weights = w.ravel(), minlength = B*ns).reshape(B, ns)
+    c0 = np.bincount(ix[:,m:].ravel(), weights = w[:,m:].ravel(), minlength = B*ns).reshape(B, ns)
+    
+    # Schur complement H + sum_i w_i a_i a_i' - C' diag(1/c) C = H + sum_i w_i (a_i - abar_i)(a_i - abar_i)', where
+    # C is the coupling block of (z, rI, rE) and d, a_i the gradient in row i of G (zero for the nonnegativity rows) and 
+    # abar_i the weighted mean of the rows with the same slack variable; this form has no cancellation (which occurs 
+    # for very different weights w). It is summed over the chunks of rows, which contain all rows of their slack variables.
+    S = H.copy()
+    for J_c, offsets, signs, starts, s_c, group in rows.blocks():
+        w_c = [w[:,o:o+J_c.shape[1]] for o in offsets]
+        
+        C = sum(sign*np.add.reduceat(w_k[:,:,np.newaxis]*J_c, starts, axis = 1) for w_k, sign in zip(w_c, signs))
+        abar = C / c[:,s_c,np.newaxis]
+        for w_k, sign in zip(w_c, signs):
+            # the rows are sign*J_c, (w_k)^(1/2) * (J_c - sign*abar) has the same outer products (in place, one chunk)
+            dev = abar[:,group,:]
+            dev *= -sign
+            dev += J_c
+            dev *= np.sqrt(w_k)[:,:,np.newaxis]
+            S += np.swapaxes(dev, 1, 2) @ dev
+        S += np.swapaxes(c0[:,s_c,np.newaxis]*abar, 1, 2) @ abar
+    
+    # a singular S raises ArithmeticError, which is handled by cvxopt
+    L = [cx.matrix(S[b]) for b in range(B)]
+    for L_b in L:
+        cx.lapack.potrf(L_b)
+    del S
+    
+    def solve(x, y, z):
+        bx = np.array(x).reshape(B, dim+ns); bz = np.array(z).reshape(B, mG)
+        v = w * bz
+        r_d = bx[:,:dim] + rows.tproduct(v[:,:m])
+        r_s = bx[:,dim:] - np.bincount(ix.ravel(), weights = v.ravel(), minlength = B*ns).reshape(B, ns)
+        
+        # u_d = r_d + C' (r_s / c)
+        u_d = r_d + rows.tproduct(w[:,:m] * (r_s / c)[:,slack[:m]])
+        for b in range(B):
+            u_b = cx.matrix(u_d[b])
+            cx.lapack.potrs(L[b], u_b)
+            u_d[b] = np.array(u_b).ravel()
+        # u_s = (r_s + C u_d) / c
+        Gd = rows.product(u_d)
+        u_s = (r_s + np.bincount(ix[:,:m].ravel(), weights = (w[:,:m]*Gd).ravel(), minlength = B*ns).reshape(B, ns)) / c
+        
+        Gu = -u_s[:,slack]
+        Gu[:,:m] += Gd
+        x[:] = cx.matrix(np.hstack((u_d, u_s)).ravel())
+        z[:] = cx.matrix((di * (Gu - bz)).ravel())
+        return
+    
+    return solve
+
 #%%
 
 class Subproblem:
@@ -386,35 +812,94 @@ class Subproblem:
         self.pI = pI
         self.pE = pE
         
-        self.P, self.q, self.inG, self.inh, self.nonnegG, self.nonnegh = self.initialize()
+        # first row of every component block in inG (relative to the start of the inequality/equality rows)
+        self.starts_I = np.concatenate(([0], np.cumsum(1+pI)[:-1])).astype(int)
+        self.starts_E = np.concatenate(([0], np.cumsum(1+pE)[:-1])).astype(int)
+        
+        self.initialize()
+        
+        # statistics: number of solves, total time and interior-point iterations spent in the QP solver
+        self.n_solves = 0
+        self.qp_time = 0.
+        self.qp_iter = 0
         
     
-    def solve(self):
+    def solve(self, options = None, structured = True):
         """
         This solves the quadratic program. In every iteration, you should call self.update() before solving in order to have the correct subproblem data.
         
+        options: dict, optional
+            cvxopt solver options (abstol, reltol, feastol) for an inexact solve, see qp_tolerances. 
+            If the inexact solve does not reach its tolerances, the QP is solved again with the default tolerances.
+            Otherwise, the result is post-corrected: the slack variables rI, rE are clipped to be nonnegative and
+            lambda_f is rescaled such that lambda_f.sum() == rho (which holds for the exact solution).
+        
+        structured: bool, optional
+            If True, G is a function of the gradient rows (G_operator) and the KKT systems are solved with 
+            self.kktsolver, both read the gradient rows in chunks. If this does not reach an optimal solution 
+            (degenerate QPs, e.g. for a nearly singular H), the QP is solved again with the default KKT solver of cvxopt,
+            which terminates more reliably in this case (but it needs G as a sparse matrix, i.e. a copy of the gradient 
+            rows, and its cost grows quadratically with the number of rows of G).
+        
         self.d: array
             search direction
             
         self.lambda_f: array
             KKT multipier for objective.
             
-        self.lambda_gE: list
-            KKT multipier for equality constraints. 
+        self.lambda_I, self.lambda_E: array
+            KKT multipliers for all inequality (equality) constraint components, stacked with start indices 
+            self.starts_I (self.starts_E). 
         
-        self.lambda_gI: list
-            KKT multipier for inequality constraints.    
+        self.lambda_gI, self.lambda_gE: list
+            the same multipliers split into one array per component.
 
         """
+        # cvxopt is imported on first use, so that importing ncopt stays cheap
+        import cvxopt as cx
         cx.solvers.options['show_progress'] = False
         
-        iG = np.vstack((self.inG, self.nonnegG))
-        ih = np.hstack((self.inh, self.nonnegh))
+        if structured:
+            # G as a function of the gradient rows, the QP does not copy them
+            rows = GradientRows(self.segments())
+            if rows.dense is None:
+                # many rows: G as a function of the gradient rows, the QP does not copy them
+                P, G = self.matrix_P(), G_operator(rows, self.slack, self.dimQP - self.dim)
+            else:
+                # few rows: products with a sparse matrix have less overhead
+                P, G = self.matrices(rows)
+            kktsolver = lambda W: self.kktsolver(W, rows)
+        else:
+            P, G = self.matrices()
+            kktsolver = None
+        
+        t0 = time.perf_counter()
+        if options is None:
+            qp = cx.solvers.qp(P = P, q = cx.matrix(self.q), G = G, h = cx.matrix(self.h), kktsolver = kktsolver)
+        else:
+            opts = dict(options); opts['show_progress'] = False
+            qp = cx.solvers.qp(P = P, q = cx.matrix(self.q), G = G, h = cx.matrix(self.h), kktsolver = kktsolver, options = opts)
+        
+        self.n_solves += 1
+        self.qp_time += time.perf_counter() - t0
+        self.qp_iter += qp["iterations"]
         
-        qp = cx.solvers.qp(P = cx.matrix(self.P), q = cx.matrix(self.q), G = cx.matrix(iG), h = cx.matrix(ih))
+        if (options is not None) and (qp["status"] != 'optimal'):
+            return self.solve(structured = structured)
+        if structured and (qp["status"] != 'optimal'):
+            return self.solve(structured = False)
         
         self.status = qp["status"]
-        self.cvx_sol_x = np.array(qp['x']).squeeze()
+        self.set_solution(np.array(qp['x']).ravel(), np.array(qp['z']).ravel(), inexact = options is not None)
+        
+        return 
+    
+    def set_solution(self, x, z, inexact = False):
+        """
+        extracts direction and KKT multipliers from the primal (x) and dual (z) solution of the QP
+        """
+        self.cvx_sol_x = x
+        self.cvx_sol_z = z
         
         self.d = self.cvx_sol_x[:self.dim]
         self.z = self.cvx_sol_x[self.dim]
@@ -422,39 +907,34 @@ class Subproblem:
         self.rI = self.cvx_sol_x[self.dim +1          : self.dim +1 +self.nI]
         self.rE = self.cvx_sol_x[self.dim +1 + self.nI : ]
         
+        if inexact:
+            self.rI = np.maximum(self.rI, 0)
+            self.rE = np.maximum(self.rE, 0)
 
         assert len(self.rE) == self.nE
         assert np.all(self.rI >= -1e-5) , f"{self.rI}"
         assert np.all(self.rE >= -1e-5), f"{self.rE}"
         
-        # extract dual variables = KKT multipliers
-        self.cvx_sol_z = np.array(qp['z']).squeeze()
-        lambda_f = self.cvx_sol_z[:self.p0+1]
-        
-        lambda_gI = list()
-        for j in np.arange(self.nI):
-            start_ix = self.p0+1+(1+self.pI)[:j].sum()
-            lambda_gI.append( self.cvx_sol_z[start_ix : start_ix + 1+self.pI[j]]  )
-        
-        lambda_gE = list()
-        for j in np.arange(self.nE):
-            start_ix = self.p0+1+(1+self.pI).sum()+(1+self.pE)[:j].sum()
-            
-            # from ineq with +
-            vec1 = self.cvx_sol_z[start_ix : start_ix + 1+self.pE[j]]
-            
-            # from ineq with -
-            vec2 = self.cvx_sol_z[start_ix+(1+self.pE).sum() : start_ix + (1+self.pE).sum() + 1+self.pE[j]]
-            
-            # see Direction.m line 620
-            lambda_gE.append(vec1-vec2)
-     
-        self.lambda_f = lambda_f.copy()
-        self.lambda_gI = lambda_gI.copy()
-        self.lambda_gE = lambda_gE.copy()
+        # extract dual variables = KKT multipliers, rows of inG are (p0+1, sum(1+pI), sum(1+pE), sum(1+pE))
+        mF, mI, mE = self.p0+1, np.sum(1+self.pI), np.sum(1+self.pE)
+        self.lambda_f = self.cvx_sol_z[:mF].copy()
+        self.lambda_I = self.cvx_sol_z[mF : mF+mI].copy()
+        # from ineq with + minus from ineq with -, see Direction.m line 620
+        self.lambda_E = self.cvx_sol_z[mF+mI : mF+mI+mE] - self.cvx_sol_z[mF+mI+mE : mF+mI+2*mE]
         
-        return 
+        if inexact:
+            # stationarity w.r.t. z gives lambda_f.sum() == rho, rho is the coefficient of z in q
+            self.lambda_f *= self.q[self.dim] / max(self.lambda_f.sum(), 1e-16)
         
+        return
+    
+    @property
+    def lambda_gI(self):
+        return np.split(self.lambda_I, self.starts_I[1:])
+    
+    @property
+    def lambda_gE(self):
+        return np.split(self.lambda_E, self.starts_E[1:])
         
     def initialize(self):
         """
@@ -468,37 +948,80 @@ class Subproblem:
         rI = helper variable for inequality constraints
         rI = helper variable for equality constraints
         
-        This function initializes the variables P,q,G,h. The entries which change in every iteration are then updated in self.update()
-        
-        G and h consist of two parts:
-            1) inG, inh: the inequalities from the paper
-            2) nonnegG, nonnegh: nonnegativity bounds rI >= 0, rE >= 0
+        P and G are sparse: P only has the dim x dim block H, G has dim (gradient) entries and one -1 (for z or the 
+        slack of the component) in every row of the inequalities from the paper (inG), and -1 in the nonnegativity 
+        rows rI >= 0, rE >= 0. This function sets up the (constant) position of the -1 entries; 
+        the entries which change in every iteration are set in self.update().
         """
+        dim, nI, nE = self.dim, self.nI, self.nE
+        self.dimQP = dim+1 + nI + nE
         
-        dimQP = self.dim+1 + self.nI + self.nE
-        
-        P = np.zeros((dimQP, dimQP))
-        q = np.zeros(dimQP)
+        # structure of inG (p0+1, sum(1+pI), sum(1+pE), sum(1+pE))
+        comp_I = np.repeat(np.arange(nI), 1+self.pI)
+        comp_E = np.repeat(np.arange(nE), 1+self.pE)
+        slack = np.concatenate((np.full(self.p0+1, dim), dim+1+comp_I, dim+1+nI+comp_E, dim+1+nI+comp_E))
+        self.m = len(slack)
         
-        inG = np.zeros((1 + self.p0+np.sum(1+self.pI) + 2*np.sum(1+self.pE), dimQP))
-        inh = np.zeros( 1 + self.p0+np.sum(1+self.pI) + 2*np.sum(1+self.pE))
+        # for every row of G, the index of its -1 entry in (z, rI, rE)
+        self.slack = np.concatenate((slack, dim+1 + np.arange(nI+nE))) - dim
+        # gradient rows, set in self.update (until then zeros, which take no memory)
+        self.D_f = np.broadcast_to(0., (self.p0+1, dim))
+        self.G_I = np.broadcast_to(0., (np.sum(1+self.pI), dim))
+        self.G_E = np.broadcast_to(0., (np.sum(1+self.pE), dim))
         
-        # structure of inG (p0+1, sum(1+pI), sum(1+pE), sum(1+pE))
-        inG[:self.p0+1, self.dim] = -1
+        self.P_I = np.repeat(np.arange(dim), dim)
+        self.P_J = np.tile(np.arange(dim), dim)
+        self.P_V = np.eye(dim).ravel()
         
-        for j in range(self.nI):
-            inG[self.p0+1+(1+self.pI)[:j].sum()                                     :  self.p0+1+(1+self.pI)[:j].sum()                                      + self.pI[j]+1, self.dim+1+j]         = -1
-            
-        for j in range(self.nE):
-            inG[self.p0+1+(1+self.pI).sum()+(1+self.pE)[:j].sum()                   :  self.p0+1+(1+self.pI).sum()+(1+self.pE)[:j].sum()                    + self.pE[j]+1, self.dim+1+self.nI+j] = -1
-            inG[self.p0+1+(1+self.pI).sum()+(1+self.pE).sum()+(1+self.pE)[:j].sum() :  self.p0+1+(1+self.pI).sum()+(1+self.pE).sum()+(1+self.pE)[:j].sum()  + self.pE[j]+1, self.dim+1+self.nI+j] = -1
-            
-        # we have nI+nE r-variables
-        nonnegG = np.hstack((np.zeros((self.nI + self.nE, self.dim + 1)), -np.eye(self.nI + self.nE)))
-        nonnegh = np.zeros(self.nI + self.nE)
+        self.q = np.zeros(self.dimQP)
+        self.h = np.zeros(self.m + nI + nE)
      
-        return P,q,inG,inh,nonnegG,nonnegh
+        return
+    
+    def segments(self):
+        """
+        gradient rows of G (i.e. of inG): list of (J, slack, offsets, signs), where J (with a leading dimension 1) 
+        appears in the rows offsets + (0, ..., len(J)-1) of G with factor sign, slack is the index of the -1 entry 
+        in (z, rI, rE) of these rows. The rows of equality constraints appear twice (with + and -).
+        The arrays are the ones passed to self.update (no copies), e.g. a memory map for g_linear_mmap.
+        """
+        mF, mI, mE = self.p0+1, len(self.G_I), len(self.G_E)
+        segments = [(self.D_f[np.newaxis], self.slack[:mF], [0], [1.]),
+                    (self.G_I[np.newaxis], self.slack[mF:mF+mI], [mF], [1.]),
+                    (self.G_E[np.newaxis], self.slack[mF+mI:mF+mI+mE], [mF+mI, mF+mI+mE], [1., -1.])]
+        return [seg for seg in segments if len(seg[1]) > 0]
+    
+    @property
+    def inG(self):
+        # gradient rows of G as one (dense) array
+        return GradientRows(self.segments()).product(np.eye(self.dim)).T
 
+    def matrix_P(self):
+        import cvxopt as cx
+        return cx.spmatrix(self.P_V, self.P_I, self.P_J, (self.dimQP, self.dimQP))
+
+    def matrices(self, rows = None):
+        """
+        P and G as sparse cvxopt matrices, G holds a copy of the gradient rows (rows: GradientRows, created if None)
+        G is assembled from its blocks (gradient columns, -1 entries), as cvxopt.spmatrix is slow for long columns
+        """
+        import cvxopt as cx
+        m, n_nonneg = self.m, self.nI + self.nE
+        rows = GradientRows(self.segments()) if rows is None else rows
+        P = self.matrix_P()
+        D = cx.sparse([[cx.sparse(cx.matrix(v, (m, 1)))] for v in rows.product(np.eye(self.dim))])
+        D = cx.sparse([D, cx.spmatrix([], [], [], (n_nonneg, self.dim))])
+        R = cx.spmatrix(-1., np.arange(len(self.slack)), self.slack, (len(self.slack), self.dimQP - self.dim))
+        return P, cx.sparse([[D], [R]])
+
+    def kktsolver(self, W, rows = None):
+        """
+        KKT solver for cvxopt.solvers.qp, see structured_kktsolver
+        rows are the GradientRows of self.segments() (created if None)
+        """
+        dim = self.dim
+        rows = GradientRows(self.segments()) if rows is None else rows
+        return structured_kktsolver(self.P_V.reshape(1, dim, dim), rows, self.slack, self.dimQP - dim, W)
 
     def update(self, H, rho, D_f, D_gI, D_gE, f_k, gI_k, gE_k):
         """
@@ -511,10 +1034,10 @@ class Subproblem:
             parameter
         D_f : array
             gradient of f at the sampled points
-        D_gI : list
-            j-th element is the gradient array of c^j at the sampled points.
-        D_gE : list
-            j-th element is the gradient array of h^j at the sampled points.
+        D_gI : list or tuple
+            j-th element is the gradient array of c^j at the sampled points, or all of them stacked (see stack_blocks).
+        D_gE : list or tuple
+            j-th element is the gradient array of h^j at the sampled points, or all of them stacked (see stack_blocks).
         f_k : float
             evaluation of f at x_k.
         gI_k : array
@@ -527,25 +1050,21 @@ class Subproblem:
         None.
 
         """
-        self.P[:self.dim, :self.dim] = H
-        self.q = np.hstack((np.zeros(self.dim), rho, np.ones(self.nI), np.ones(self.nE))) 
+        dim = self.dim
+        G_I = D_gI[0] if isinstance(D_gI, tuple) else stack_blocks(D_gI, dim)[0]
+        G_E = D_gE[0] if isinstance(D_gE, tuple) else stack_blocks(D_gE, dim)[0]
+        mF, mI, mE = self.p0+1, len(G_I), len(G_E)
+        assert mF + mI + 2*mE == self.m
         
-        self.inG[:self.p0+1, :self.dim] =  D_f
-        self.inh[:self.p0+1]            = -f_k
+        self.P_V = np.ravel(H).copy()
+        self.q = np.hstack((np.zeros(dim), rho, np.ones(self.nI), np.ones(self.nE))) 
         
-        for j in range(self.nI):
-            self.inG[self.p0+1+(1+self.pI)[:j].sum()        :  self.p0+1+(1+self.pI)[:j].sum()        + self.pI[j]+1, :self.dim]    =  D_gI[j]
-            self.inh[self.p0+1+(1+self.pI)[:j].sum()        :  self.p0+1+(1+self.pI)[:j].sum()        + self.pI[j]+1]               = -gI_k[j] 
-            
-        for j in range(self.nE):
-            self.inG[self.p0+1+(1+self.pI).sum()+(1+self.pE)[:j].sum()                   :  self.p0+1+(1+self.pI).sum()+(1+self.pE)[:j].sum()                   + self.pE[j]+1, :self.dim]  =  D_gE[j]
-            self.inG[self.p0+1+(1+self.pI).sum()+(1+self.pE).sum()+(1+self.pE)[:j].sum() :  self.p0+1+(1+self.pI).sum()+(1+self.pE).sum()+(1+self.pE)[:j].sum() + self.pE[j]+1, :self.dim]  = -D_gE[j]
-            
-            self.inh[self.p0+1+(1+self.pI).sum()+(1+self.pE)[:j].sum()                   :  self.p0+1+(1+self.pI).sum()+(1+self.pE)[:j].sum()                   + self.pE[j]+1]             = -gE_k[j]
-            self.inh[self.p0+1+(1+self.pI).sum()+(1+self.pE).sum()+(1+self.pE)[:j].sum() :  self.p0+1+(1+self.pI).sum()+(1+self.pE).sum()+(1+self.pE)[:j].sum() + self.pE[j]+1]             =  gE_k[j]
-            
+        # gradient rows of G, kept as references (see self.segments)
+        self.D_f, self.G_I, self.G_E = D_f, G_I, G_E
+        
+        self.h[:mF]                   = -f_k
+        self.h[mF:mF+mI]              = -np.repeat(gI_k, 1+self.pI)
+        self.h[mF+mI:mF+mI+mE]        = -np.repeat(gE_k, 1+self.pE)
+        self.h[mF+mI+mE:mF+mI+2*mE]   =  np.repeat(gE_k, 1+self.pE)
        
-        return        
-    
-
-
+        return
@@ -0,0 +1,128 @@
+"""
+author: Fabian Schaipp
+
+Surrogate-assisted constraints: the gradients (and values) at the sample points of SQP-GS come from a cheap surrogate
+(e.g. a ncopt.torch_obj.Net trained with ncopt.torch_surrogate.fit_surrogate), while the true oracle is only called at
+x_k and in the line search.
+"""
+
+import numpy as np
+
+from .sqpgs import eval_rows, compute_gradients
+
+class SurrogateConstraint:
+    """
+    Wraps an expensive constraint fun together with a surrogate.
+
+    eval(x), grad(x) : true oracle (used by SQP-GS at x_k and in the line search phi_rho)
+    eval_samples(B), grad_samples(B) : called by SQP-GS for the sampled points B with B[0] = x_k. The true oracle is used
+        at x_k, the surrogate at all other points.
+
+    Once per set of sample points B, the surrogate values at x_k and at the last sample point B[-1] are compared to the
+    true values. Values (unlike Jacobians) are continuous at the kinks of a nonsmooth fun, hence a smooth surrogate is
+    not rejected because x_k approaches a kink. If the relative error exceeds tol, the true values and gradients are
+    used at all sample points of this iteration. After max_failures consecutive failures, retrain(fun, x_k) is called
+    and has to return a new surrogate. If retrain is None, the surrogate is checked again in the next iteration and used
+    as soon as it passes.
+
+    Parameters
+    ----------
+    fun : function object
+        the true constraint.
+    surrogate : function object
+        cheap approximation of fun with the same dimOut, ideally with eval_batch and grad_batch.
+    tol : float, optional
+        tolerance for the error of the surrogate values, relative to max(|fun(x_k)|, 1). The default is 0.1.
+    max_failures : int, optional
+        number of consecutive failures before retraining. The default is 3.
+    retrain : callable, optional
+        (fun, x_k) --> new surrogate. The default is None.
+    """
+    def __init__(self, fun, surrogate, tol = 1e-1, max_failures = 3, retrain = None):
+        self.name = 'surrogate_' + getattr(fun, 'name', 'fun')
+        self.fun = fun
+        self.surrogate = surrogate
+        self.dimOut = fun.dimOut
+        if hasattr(fun, 'dim'):
+            self.dim = fun.dim
+
+        self.tol = tol
+        self.max_failures = max_failures
+        self.retrain = retrain
+        # whether the surrogate is used for the current sample points
+        self.active = True
+
+        # statistics
+        self.errors = list()
+        self.n_fallback = 0
+        self.n_retrain = 0
+        self._failures = 0
+        # last true evaluation, the value at x_k is requested twice per iteration
+        self._cache = (None, None)
+        # sample points of the last check and the values returned for them
+        self._B = None
+        self._V = None
+        return
+
+    def eval(self, x):
+        if self._cache[0] is not None and np.array_equal(self._cache[0], x):
+            return self._cache[1]
+        val = self.fun.eval(x)
+        self._cache = (np.array(x, copy = True), val)
+        return val
+
+    def grad(self, x):
+        return self.fun.grad(x)
+
+    def check(self, B):
+        """
+        decides whether the surrogate is used at the sample points B (once per B, eval_samples and grad_samples
+        always agree).
+        """
+        if self._B is not None and np.array_equal(self._B, B):
+            return self.active
+
+        self._B = np.array(B, copy = True)
+        V = np.array(np.reshape(eval_rows(self.surrogate, B), (-1, self.dimOut)), copy = True)
+        V0 = np.reshape(self.eval(B[0]), self.dimOut)
+        V1 = np.reshape(self.fun.eval(B[-1]), self.dimOut)
+
+        err = max(np.linalg.norm(V[0] - V0), np.linalg.norm(V[-1] - V1)) / max(np.linalg.norm(V0), 1.)
+        self.errors.append(err)
+
+        if err <= self.tol:
+            self._failures = 0
+            self.active = True
+        else:
+            self._failures += 1
+            self.n_fallback += 1
+            self.active = False
+            if self._failures >= self.max_failures and self.retrain is not None:
+                self._failures = 0
+                self.surrogate = self.retrain(self.fun, B[0])
+                self.n_retrain += 1
+            # true values at all sample points
+            if B.shape[0] > 2:
+                V[1:-1] = np.reshape(eval_rows(self.fun, B[1:-1]), (-1, self.dimOut))
+
+        V[0] = V0
+        V[-1] = V1
+        self._V = V
+        return self.active
+
+    def eval_samples(self, B):
+        self.check(B)
+        return self._V.copy()
+
+    def grad_samples(self, B):
+        (N, dim) = B.shape
+        J0 = np.reshape(self.fun.grad(B[0]), (self.dimOut, dim))
+
+        if self.check(B):
+            D = compute_gradients(self.surrogate, B).copy()
+            D[0] = J0
+            return D
+
+        # true gradients at all sample points
+        D = compute_gradients(self.fun, B[1:])
+        return np.concatenate((J0[np.newaxis,:,:], D), axis = 0)
@@ -0,0 +1,65 @@
+"""
+author: Fabian Schaipp
+"""
+
+import numpy as np
+import sys, os
+
+tests_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, tests_path + '/../..')
+
+from ncopt.batch import SQP_GS_batch, InstanceBatch
+from ncopt.funs import f_rosenbrock, f_rosenbrock_batch, g_linear_batch
+
+def test_batch_linear_ineq():
+    # x_1 <= b_1 is active, solution is (b_1, b_1^2)
+    b = np.array([[0.5, 2.], [0.6, 2.], [0.7, 2.]])
+    f = InstanceBatch([f_rosenbrock()]*len(b))
+    g = g_linear_batch(np.eye(2), b)
+    
+    x_k, x_hist, info = SQP_GS_batch(f, [g], [], tol = 1e-8, max_iter = 200, verbose = False, rng = 0)
+    
+    xstar = np.vstack((b[:,0], b[:,0]**2)).T
+    np.testing.assert_array_almost_equal(x_k, xstar, decimal = 4)
+    assert np.all(info['status'] == 'optimal')
+    assert np.all(info['n_iter'] == np.array([len(h)-1 for h in x_hist]))
+
+    return
+
+def test_batch_linear_eq():
+    b = np.array([[1., 1.], [0.5, 0.3]])
+    f = InstanceBatch([f_rosenbrock()]*len(b))
+    g = g_linear_batch(np.eye(2), b)
+    
+    x_k, x_hist, info = SQP_GS_batch(f, [], [g], tol = 1e-8, max_iter = 200, verbose = False, rng = 0)
+    
+    np.testing.assert_array_almost_equal(x_k, b, decimal = 4)
+
+    return
+
+class counting_rosenbrock(f_rosenbrock_batch):
+    def __init__(self, w):
+        super().__init__(w)
+        self.n_grad = 0
+
+    def grad(self, X, ix):
+        self.n_grad += 1
+        return super().grad(X, ix)
+
+def test_batch_vectorized():
+    # vectorized objective with instance-dependent weights, the solution (b_1, b_1^2) does not depend on w
+    rng = np.random.default_rng(0)
+    n = 8
+    b = np.vstack((0.5 + 0.3*rng.random(n), 2*np.ones(n))).T
+    f = counting_rosenbrock(4 + 8*rng.random(n))
+    g = g_linear_batch(np.eye(2), b)
+    
+    x_k, x_hist, info = SQP_GS_batch(f, [g], [], tol = 1e-6, max_iter = 200, verbose = False, rng = 0)
+    
+    xstar = np.vstack((b[:,0], b[:,0]**2)).T
+    np.testing.assert_array_almost_equal(x_k, xstar, decimal = 3)
+    assert np.all(info['status'] == 'optimal')
+    # one (vectorized) gradient call for all active instances per iteration
+    assert f.n_grad == info['n_iter'].max()
+    
+    return
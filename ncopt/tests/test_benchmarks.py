@@ -0,0 +1,40 @@
+"""
+author: Fabian Schaipp
+"""
+
+import numpy as np
+import sys, os
+
+tests_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, tests_path + '/../..')
+
+from ncopt.benchmarks import PROBLEMS, make_problem, run_problem
+from ncopt.finite_diff import FiniteDifference
+
+def test_problem_gradients():
+    # at random points all functions are differentiable, compare with central differences
+    rng = np.random.default_rng(1)
+    for name in PROBLEMS:
+        problem = make_problem(name, 4, n_con = 3)
+        for fun in [problem['f']] + problem['gI'] + problem['gE']:
+            X = rng.random((5, 4)) + 0.1
+            D = FiniteDifference(fun, method = 'central').grad_batch(X)
+            for i in range(5):
+                np.testing.assert_array_almost_equal(np.reshape(fun.grad(X[i]), (fun.dimOut, 4)), D[i], decimal = 5)
+            
+            V = fun.eval_batch(X)
+            assert V.shape == (5, fun.dimOut)
+            np.testing.assert_array_almost_equal(V[2], np.atleast_1d(fun.eval(X[2])))
+    
+    return
+
+def test_run_problem():
+    problem = make_problem('rosenbrock', 2)
+    rec = run_problem(problem, max_iter = 200)
+    
+    np.testing.assert_almost_equal(rec['f'], (1-1/np.sqrt(2))**2, decimal = 4)
+    assert rec['n_grad'] == rec['n_iter'] * (3 + 4)
+    assert rec['n_qp'] == rec['n_iter']
+    assert 0 < rec['qp_time'] < rec['wall_time']
+    
+    return
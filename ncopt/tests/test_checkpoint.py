@@ -0,0 +1,54 @@
+"""
+author: Fabian Schaipp
+"""
+
+import numpy as np
+import sys, os
+
+tests_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, tests_path + '/../..')
+
+from ncopt.sqpgs import SQP_GS
+from ncopt.linesearch import LineSearch
+from ncopt.funs import f_rosenbrock, g_max, g_linear
+
+def test_resume_bitwise(tmp_path):
+    f = f_rosenbrock()
+    gI = [g_max()]
+    gE = [g_linear(np.array([[1., 1.]]), np.array([1.2]))]
+    x0 = np.array([0.3, -0.4])
+    path = str(tmp_path / 'sqpgs.npz')
+    
+    x_full, hist_full, SP_full = SQP_GS(f, gI, gE, x0, max_iter = 40, verbose = False, rng = 3)
+    
+    # interrupted run: last checkpoint after 20 iterations
+    SQP_GS(f, gI, gE, x0, max_iter = 23, verbose = False, rng = 3, checkpoint = path, checkpoint_every = 5)
+    x_k, x_hist, SP, info = SQP_GS(f, gI, gE, max_iter = 40, verbose = False, resume = path, return_info = True)
+    
+    np.testing.assert_array_equal(x_hist, hist_full)
+    np.testing.assert_array_equal(x_k, x_full)
+    assert info['n_qp'] == SP_full.n_solves
+    
+    # no temporary files are left over
+    assert os.listdir(tmp_path) == ['sqpgs.npz']
+    
+    return
+
+def test_resume_nonmonotone(tmp_path):
+    # the merit history of the nonmonotone line search is part of the checkpoint
+    f = f_rosenbrock()
+    gI = [g_max()]
+    gE = []
+    path = str(tmp_path / 'sqpgs.npz')
+    
+    x_full, hist_full, SP_full, info_full = SQP_GS(f, gI, gE, max_iter = 40, verbose = False, rng = 5, return_info = True,
+                                                   line_search = LineSearch(memory = 5))
+    
+    SQP_GS(f, gI, gE, max_iter = 27, verbose = False, rng = 5, checkpoint = path, checkpoint_every = 9, line_search = LineSearch(memory = 5))
+    x_k, x_hist, SP, info = SQP_GS(f, gI, gE, max_iter = 40, verbose = False, resume = path, return_info = True,
+                                   line_search = LineSearch(memory = 5))
+    
+    np.testing.assert_array_equal(x_hist, hist_full)
+    np.testing.assert_array_equal(info['n_merit'], info_full['n_merit'])
+    
+    return
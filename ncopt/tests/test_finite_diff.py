@@ -0,0 +1,57 @@
+"""
+author: Fabian Schaipp
+"""
+
+import numpy as np
+import sys, os
+
+tests_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, tests_path + '/../..')
+
+from ncopt.finite_diff import FiniteDifference
+from ncopt.sqpgs import SQP_GS
+from ncopt.funs import f_rosenbrock, g_max
+
+class g_smooth:
+    """
+    x -> (sin(x_1)*x_2, exp(x_1) + x_2^2), only eval is available
+    """
+    def __init__(self):
+        self.dim = 2
+        self.dimOut = 2
+        self.n_calls = 0
+        
+    def eval_batch(self, X):
+        self.n_calls += 1
+        return np.vstack((np.sin(X[:,0])*X[:,1], np.exp(X[:,0]) + X[:,1]**2)).T
+    
+    def eval(self, x):
+        return self.eval_batch(x[np.newaxis,:])[0]
+    
+    def jac(self, x):
+        return np.array([[np.cos(x[0])*x[1], np.sin(x[0])], [np.exp(x[0]), 2*x[1]]])
+
+def test_fd_jacobian():
+    X = np.random.randn(5, 2)
+    
+    for method, decimal in zip(['forward', 'central', 'complex'], [6, 8, 12]):
+        g = g_smooth()
+        G = FiniteDifference(g, method = method)
+        D = G.grad_batch(X)
+        
+        # all perturbation points are evaluated in one call
+        assert g.n_calls == 1
+        assert D.shape == (5, 2, 2)
+        for i in range(5):
+            np.testing.assert_array_almost_equal(D[i], g.jac(X[i]), decimal = decimal)
+    
+    return
+
+def test_rosenbrock_fd():
+    f = f_rosenbrock()
+    g = FiniteDifference(g_max(), method = 'central')
+    xstar = np.array([1/np.sqrt(2), 0.5])
+    x_k, x_hist, SP = SQP_GS(f, [g], [], tol = 1e-8, max_iter = 200, verbose = False, rng = 0)
+    np.testing.assert_array_almost_equal(x_k, xstar, decimal = 4)
+    
+    return
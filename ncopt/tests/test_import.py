@@ -0,0 +1,51 @@
+"""
+author: Fabian Schaipp
+
+Import-time benchmark: importing ncopt (or the solver module) must not pull in heavy backends.
+"""
+
+import subprocess
+import sys, os
+
+tests_path = os.path.dirname(os.path.abspath(__file__))
+root_path = os.path.abspath(tests_path + '/../..')
+
+HEAVY = ['cvxopt', 'torch', 'scipy', 'matplotlib']
+
+def _run(code, *flags):
+    return subprocess.run([sys.executable, *flags, '-c', code], cwd = root_path, capture_output = True, text = True, check = True)
+
+def import_time(module):
+    """
+    cumulative import time of module in a fresh interpreter (in seconds), measured with -X importtime
+    """
+    out = _run(f"import {module}", '-X', 'importtime').stderr
+    for line in out.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) * 1e-6
+    raise ValueError(f"{module} not found in importtime output")
+
+def test_no_heavy_imports():
+    for module in ['ncopt', 'ncopt.sqpgs', 'ncopt.funs']:
+        out = _run(f"import sys, {module}; print(' '.join(sorted(sys.modules)))").stdout.split()
+        for m in HEAVY:
+            assert m not in out, f"importing {module} loads {m}"
+    
+    return
+
+def test_lazy_attributes():
+    out = _run("import sys, ncopt; f = ncopt.SQP_GS; print('ncopt.sqpgs' in sys.modules, 'cvxopt' in sys.modules)").stdout
+    assert out.split() == ['True', 'False']
+    
+    return
+
+def test_import_time():
+    # importing the package itself does not even load numpy
+    assert import_time('ncopt') < 0.05
+    
+    return
+
+if __name__ == '__main__':
+    for module in ['ncopt', 'ncopt.funs', 'ncopt.sqpgs', 'ncopt.batch', 'ncopt.multistart']:
+        print(f"{module:20s} {1e3*import_time(module):8.1f} ms")
@@ -0,0 +1,87 @@
+"""
+author: Fabian Schaipp
+"""
+
+import numpy as np
+import tracemalloc
+import sys, os
+
+tests_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, tests_path + '/../..')
+
+from ncopt.sqpgs import SQP_GS, compute_gradients
+from ncopt.funs import f_rosenbrock, g_linear, g_linear_mmap
+from ncopt.benchmarks.problems import f_rosenbrock_nd
+
+class counting_linear(g_linear_mmap):
+    def __init__(self, A, b, **kwargs):
+        super().__init__(A, b, **kwargs)
+        self.n_grad = 0
+
+    def grad(self, x):
+        self.n_grad += 1
+        return super().grad(x)
+
+def test_mmap_eval(tmp_path):
+    rng = np.random.default_rng(0)
+    A = rng.standard_normal((1000, 5))
+    b = rng.standard_normal(1000)
+    np.save(tmp_path / 'A.npy', A)
+    np.save(tmp_path / 'b.npy', b)
+
+    g = g_linear_mmap(str(tmp_path / 'A.npy'), tmp_path / 'b.npy', chunk_size = 64)
+    assert isinstance(g.A, np.memmap)
+    assert (g.dim, g.dimOut) == (5, 1000)
+
+    X = rng.standard_normal((7, 5))
+    np.testing.assert_array_almost_equal(g.eval(X[0]), A @ X[0] - b)
+    np.testing.assert_array_almost_equal(g.eval_batch(X), g_linear(A, b).eval_batch(X))
+
+    # constant Jacobian: one call of grad, no copies
+    g = counting_linear(A, b)
+    D = compute_gradients(g, X)
+    assert g.n_grad == 1
+    assert D.shape == (7, 1000, 5)
+    np.testing.assert_array_equal(D[6,3], A[3])
+
+    return
+
+def test_rosenbrock_mmap(tmp_path):
+    np.save(tmp_path / 'A.npy', np.eye(2))
+    np.save(tmp_path / 'b.npy', np.ones(2))
+    g = counting_linear(str(tmp_path / 'A.npy'), str(tmp_path / 'b.npy'), chunk_size = 1)
+
+    x_k, x_hist, SP, info = SQP_GS(f_rosenbrock(), [], [g], np.zeros(2), tol = 1e-8, max_iter = 200, verbose = False,
+                                   return_info = True, rng = 0)
+    np.testing.assert_array_almost_equal(x_k, np.ones(2), decimal = 4)
+
+    # the linear constraint is only sampled at x_k, i.e. its Jacobian appears once in the QP
+    assert g.n_grad == info['n_iter']
+    assert np.all(SP.pE == 0)
+
+    return
+
+def test_mmap_peak_memory(tmp_path):
+    # the QP reads the rows of A from the memory map in chunks of 4096 rows (G is a function, see GradientRows), hence
+    # the memory is linear in dimOut and A is not copied
+    peaks = dict()
+    for n, dim in [(20000, 2), (40000, 2), (40000, 32)]:
+        rng = np.random.default_rng(0)
+        A = rng.standard_normal((n, dim))
+        np.save(tmp_path / 'A.npy', A)
+        np.save(tmp_path / 'b.npy', 1 + np.abs(A).sum(axis = 1))
+        g = g_linear_mmap(str(tmp_path / 'A.npy'), str(tmp_path / 'b.npy'))
+        
+        tracemalloc.start()
+        SQP_GS(f_rosenbrock_nd(dim), [g], [], np.zeros(dim), max_iter = 3, verbose = False, rng = 0)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks[n, dim] = peak
+    
+    # sample values, multipliers and vectors of the interior-point method: less than 64 floats per component
+    assert peaks[40000, 2] <= 64 * 8 * 40000
+    assert peaks[40000, 2] <= 2.2 * peaks[20000, 2]
+    # A with dim = 32 has 10 MB, a copy would exceed the buffers of a few chunks of rows
+    assert peaks[40000, 32] - peaks[40000, 2] <= 8 * 4096 * 32 * 8 < A.nbytes
+    
+    return
@@ -0,0 +1,84 @@
+"""
+author: Fabian Schaipp
+"""
+
+import numpy as np
+import sys, os
+
+tests_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, tests_path + '/../..')
+
+from ncopt.sqpgs import SQP_GS, phi_rho, phi_rho_rows
+from ncopt.linesearch import LineSearch
+from ncopt.funs import f_rosenbrock, g_max
+
+class counting_merit:
+    def __init__(self, fun):
+        self.fun = fun
+        self.n_calls = 0
+
+    def __call__(self, X):
+        self.n_calls += 1
+        return np.array([self.fun(x) for x in X])
+
+def armijo_reference(phi, x_k, d_k, phi_k, delta_q, eta = 1e-8, gamma = 0.5):
+    alpha = 1.
+    phi_new = phi(x_k + alpha*d_k)
+    while phi_new > phi_k - eta*alpha*delta_q:
+        alpha *= gamma
+        phi_new = phi(x_k + alpha*d_k)
+    return alpha, phi_new
+
+def test_ladder():
+    # |x| along a direction which overshoots the minimum, the accepted step is 1/16
+    phi = lambda x: np.abs(x).sum()
+    x_k = np.array([1.])
+    d_k = np.array([-30.])
+    alpha0, phi0 = armijo_reference(phi, x_k, d_k, 1., 1.)
+
+    for ladder in [1, 3, 8]:
+        merit = counting_merit(phi)
+        alpha, phi_new, n_eval = LineSearch(ladder = ladder).search(merit, x_k, d_k, 1., 1., rho = 1.)
+        assert alpha == alpha0 and phi_new == phi0
+        assert n_eval == ladder * merit.n_calls
+        assert merit.n_calls == int(np.ceil(5/ladder))
+
+    return
+
+def test_nonmonotone():
+    phi = lambda x: np.abs(x).sum()
+    ls = LineSearch(memory = 3)
+    ls.reference(2., rho = 1.)
+
+    # an increase from 1 to 1.5 is accepted, as phi was 2 before
+    alpha, phi_new, n_eval = ls.search(counting_merit(phi), np.array([1.]), np.array([-2.5]), 1., 1e-3, rho = 1.)
+    assert alpha == 1. and phi_new == 1.5 and n_eval == 1
+    assert ls.hist == [2., 1.]
+
+    # the history is cleared if rho changes
+    ls.reference(1., rho = 0.5)
+    assert ls.hist == [1.]
+
+    return
+
+def test_phi_rho_rows():
+    f = f_rosenbrock()
+    gI = [g_max()]
+    X = np.random.default_rng(0).standard_normal((5, 2))
+    np.testing.assert_array_almost_equal(phi_rho_rows(X, f, gI, [], 0.3), [phi_rho(x, f, gI, [], 0.3) for x in X])
+
+    return
+
+def test_rosenbrock_linesearch():
+    f = f_rosenbrock()
+    gI = [g_max()]
+    xstar = np.array([1/np.sqrt(2), 0.5])
+
+    for ls in [LineSearch(memory = 5), LineSearch(ladder = 4), LineSearch(memory = 5, ladder = 4)]:
+        x_k, x_hist, SP, info = SQP_GS(f, gI, [], tol = 1e-8, max_iter = 200, verbose = False, return_info = True,
+                                       rng = 0, line_search = ls)
+        np.testing.assert_array_almost_equal(x_k, xstar, decimal = 4)
+        assert len(info['n_merit']) == info['n_iter']
+        assert np.all(info['n_merit'] % ls.ladder == 0)
+
+    return
@@ -0,0 +1,109 @@
+"""
+author: Fabian Schaipp
+
+Checks the vectorized q_rho and stop_criterion against the original (loop-based) definitions.
+"""
+
+import numpy as np
+import pytest
+from types import SimpleNamespace
+import sys, os
+
+tests_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, tests_path + '/../..')
+
+from ncopt.sqpgs import q_rho, stop_criterion, stack_blocks
+
+def q_rho_reference(d, rho, H, f_k, gI_k, gE_k, D_f, D_gI, D_gE):
+    term1 = rho* (f_k + np.max(D_f @ d))
+
+    term2 = 0
+    for j in np.arange(len(D_gI)):
+        term2 += np.maximum(gI_k[j] + D_gI[j] @ d, 0).max()
+
+    term3 = 0
+    for l in np.arange(len(D_gE)):
+        term3 += np.abs(gE_k[l] + D_gE[l] @ d).max()
+
+    term4 = 0.5 * d@H@d
+
+    return term1+term2+term3+term4
+
+def stop_criterion_reference(g_k, SP, gI_k, gE_k, gI_vals, gE_vals):
+    val1 = np.linalg.norm(g_k, np.inf)
+    val2 = np.max(gI_k, initial = -np.inf)
+    val3 = np.max(np.abs(gE_k), initial = -np.inf)
+
+    val4 = -np.inf
+    for j in np.arange(len(gI_vals)):
+        val4 = np.maximum(val4, np.max(SP.lambda_gI[j] * gI_vals[j]))
+
+    val5 = -np.inf
+    for j in np.arange(len(gE_vals)):
+        val5 = np.maximum(val5, np.max(SP.lambda_gE[j] * gE_vals[j]))
+
+    return np.max(np.array([val1, val2, val3, val4, val5]))
+
+def random_model(rng, dim, pI, pE):
+    """
+    random blocks with 1+pI[j] (1+pE[l]) rows for every inequality (equality) component
+    """
+    D_f = rng.standard_normal((3, dim))
+    D_gI = [rng.standard_normal((1+p, dim)) for p in pI]
+    D_gE = [rng.standard_normal((1+p, dim)) for p in pE]
+    gI_k = rng.standard_normal(len(pI))
+    gE_k = rng.standard_normal(len(pE))
+    A = rng.standard_normal((dim, dim))
+    H = A @ A.T + np.eye(dim)
+    return H, D_f, D_gI, D_gE, gI_k, gE_k
+
+SIZES = [([], []), ([3], []), ([], [4]), ([3, 3, 3], [4, 4]), ([0, 5, 1], [0, 2])]
+
+@pytest.mark.parametrize('pI, pE', SIZES)
+def test_q_rho(pI, pE):
+    rng = np.random.default_rng(0)
+    dim = 5
+    H, D_f, D_gI, D_gE, gI_k, gE_k = random_model(rng, dim, pI, pE)
+
+    for r in range(10):
+        d = rng.standard_normal(dim)
+        q0 = q_rho_reference(d, 0.3, H, 1.5, gI_k, gE_k, D_f, D_gI, D_gE)
+        # as lists and as stacked blocks
+        q1 = q_rho(d, 0.3, H, 1.5, gI_k, gE_k, D_f, D_gI, D_gE)
+        q2 = q_rho(d, 0.3, H, 1.5, gI_k, gE_k, D_f, stack_blocks(D_gI, dim), stack_blocks(D_gE, dim))
+        assert np.isclose(q0, q1) and np.isclose(q0, q2)
+
+    return
+
+@pytest.mark.parametrize('pI, pE', SIZES)
+def test_stop_criterion(pI, pE):
+    rng = np.random.default_rng(1)
+    g_k = rng.standard_normal(5)
+    gI_vals = [rng.standard_normal(1+p) for p in pI]
+    gE_vals = [rng.standard_normal(1+p) for p in pE]
+    gI_k = np.array([v[0] for v in gI_vals])
+    gE_k = np.array([v[0] for v in gE_vals])
+    SP = SimpleNamespace(lambda_gI = [rng.random(1+p) for p in pI], lambda_gE = [rng.standard_normal(1+p) for p in pE])
+
+    E0 = stop_criterion_reference(g_k, SP, gI_k, gE_k, gI_vals, gE_vals)
+    E1 = stop_criterion(g_k, gI_k, gE_k, SP.lambda_gI, SP.lambda_gE, gI_vals, gE_vals)
+    E2 = stop_criterion(g_k, gI_k, gE_k, stack_blocks(SP.lambda_gI), stack_blocks(SP.lambda_gE), stack_blocks(gI_vals), stack_blocks(gE_vals))
+    assert np.isclose(E0, E1) and np.isclose(E0, E2)
+
+    return
+
+def test_stop_criterion_constant_grad():
+    # a component with constant gradient has one multiplier for all its sample values
+    rng = np.random.default_rng(2)
+    g_k = 1e-3 * rng.standard_normal(5)
+    gI_vals = [rng.standard_normal(4), rng.standard_normal(4)]
+    gI_k = np.array([v[0] for v in gI_vals])
+    lam = rng.random(4)
+    SP = SimpleNamespace(lambda_gI = [lam, np.array([2.])], lambda_gE = [])
+    SP_ref = SimpleNamespace(lambda_gI = [lam, 0.5*np.ones(4)], lambda_gE = [])
+
+    E0 = stop_criterion_reference(g_k, SP_ref, gI_k, np.zeros(0), gI_vals, [])
+    E1 = stop_criterion(g_k, gI_k, np.zeros(0), SP.lambda_gI, SP.lambda_gE, gI_vals, [])
+    assert np.isclose(E0, E1)
+
+    return
@@ -0,0 +1,79 @@
+"""
+author: Fabian Schaipp
+"""
+
+import time
+import multiprocessing
+import numpy as np
+import pytest
+import sys, os
+
+tests_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, tests_path + '/../..')
+
+from ncopt.multistart import multistart
+from ncopt.funs import f_rosenbrock, g_max
+
+f = f_rosenbrock()
+g = g_max()
+xstar = np.array([1/np.sqrt(2), 0.5])
+
+def test_multistart_rosenbrock():
+    res = multistart(f, [g], [], n_starts = 4, n_workers = 2, seed = 12, tol = 1e-8, max_iter = 200)
+    
+    assert res['n_completed'] == 4
+    assert res['stopped_by'] is None
+    np.testing.assert_array_almost_equal(res['x'], xstar, decimal = 4)
+    assert sorted([r['start'] for r in res['starts']]) == [0, 1, 2, 3]
+    
+    return
+
+def test_multistart_target():
+    # any feasible point with objective below 1 stops the run
+    res = multistart(f, [g], [], n_starts = 8, n_workers = 1, target_f = 1., seed = 12, tol = 1e-8, max_iter = 200)
+    
+    assert res['stopped_by'] == 'target'
+    assert res['n_completed'] + res['n_cancelled'] == 8
+    assert res['f'] <= 1.
+    
+    return
+
+class slow_rosenbrock(f_rosenbrock):
+    def eval(self, x):
+        time.sleep(0.05)
+        return super().eval(x)
+
+def test_multistart_time_budget():
+    # no start can finish within the budget, the running starts are stopped
+    t0 = time.perf_counter()
+    res = multistart(slow_rosenbrock(), [g], [], n_starts = 4, n_workers = 2, time_budget = 1., seed = 12, max_iter = 1000)
+    
+    assert time.perf_counter() - t0 < 3.
+    assert res['stopped_by'] == 'time_budget'
+    assert res['n_completed'] == 0 and res['n_cancelled'] == 4
+    assert res['x'] is None and res['start_status'] == ['cancelled'] * 4
+    assert len(multiprocessing.active_children()) == 0
+    
+    return
+
+class failing_rosenbrock(f_rosenbrock):
+    # the oracle fails far away from the origin
+    def eval(self, x):
+        if np.abs(x).max() > 50:
+            raise ValueError("oracle failed")
+        return super().eval(x)
+
+def test_multistart_failed_start():
+    x0 = np.array([[0., 0.], [100., 0.], [0.5, 0.5]])
+    res = multistart(failing_rosenbrock(), [g], [], x0 = x0, n_workers = 2, seed = 12, tol = 1e-8, max_iter = 200)
+    
+    assert res['start_status'] == ['completed', 'failed', 'completed']
+    assert res['n_completed'] == 2 and res['n_failed'] == 1 and res['n_cancelled'] == 0
+    failed = [r for r in res['starts'] if r['start'] == 1][0]
+    assert failed['status'] == 'failed' and 'oracle failed' in failed['error']
+    np.testing.assert_array_almost_equal(res['x'], xstar, decimal = 4)
+    
+    with pytest.raises(ValueError):
+        multistart(f, [g], [], n_starts = 2, rng = 0)
+    
+    return
@@ -0,0 +1,75 @@
+"""
+author: Fabian Schaipp
+"""
+
+import numpy as np
+import pytest
+import sys, os
+
+tests_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, tests_path + '/../..')
+
+from ncopt.remote import OracleServer, RemoteFunction
+from ncopt.sqpgs import SQP_GS
+from ncopt.funs import f_rosenbrock, g_max, g_linear
+
+def test_remote_oracle():
+    A = np.array([[1., 2.], [3., 4.], [5., 6.]]); b = np.ones(3)
+    
+    with OracleServer({'linear': g_linear(A, b), 'max': g_max()}) as server:
+        g = RemoteFunction(server.address, 'linear')
+        assert (g.dim, g.dimOut) == (2, 3)
+        
+        X = np.random.randn(7, 2)
+        np.testing.assert_array_equal(g.eval_batch(X), X @ A.T - b)
+        D = g.grad_batch(X)
+        assert D.shape == (7, 3, 2)
+        np.testing.assert_array_equal(D[3], A)
+        
+        h = RemoteFunction(server.address, 'max')
+        x = np.array([0.3, 0.1])
+        assert h.eval(x) == g_max().eval(x)
+        np.testing.assert_array_equal(h.grad(x), g_max().grad(x))
+        
+        # errors on the server are raised on the client, the connection stays usable
+        with pytest.raises(RuntimeError):
+            g.eval_batch(np.zeros((2, 5)))
+        np.testing.assert_array_equal(g.eval(x), A @ x - b)
+    
+    return
+
+def test_remote_sqpgs(tmp_path):
+    f = f_rosenbrock()
+    x_local = SQP_GS(f, [g_max()], [], max_iter = 50, verbose = False, rng = 1)[1]
+    
+    address = str(tmp_path / 'oracle.sock')
+    with OracleServer({'max': g_max()}, address) as server:
+        g = RemoteFunction(server.address, 'max')
+        x_k, x_hist, SP, info = SQP_GS(f, [g], [], max_iter = 50, verbose = False, rng = 1, return_info = True)
+    
+    np.testing.assert_array_equal(x_hist, x_local)
+    
+    return
+
+def test_remote_requests_per_iteration():
+    x_local = SQP_GS(f_rosenbrock(), [g_max()], [], max_iter = 20, verbose = False, rng = 1)[1]
+    
+    with OracleServer({'rosenbrock': f_rosenbrock(), 'max': g_max()}) as server:
+        f = RemoteFunction(server.address, 'rosenbrock')
+        g = RemoteFunction(server.address, 'max')
+        n0 = (f.n_requests, g.n_requests)
+        x_k, x_hist, SP, info = SQP_GS(f, [g], [], max_iter = 20, verbose = False, rng = 1, return_info = True)
+        n_f, n_g = f.n_requests - n0[0], g.n_requests - n0[1]
+        
+        X = np.random.randn(5, 2)
+        V, D = g.eval_grad_batch(X)
+        np.testing.assert_array_equal(V, g.eval_batch(X))
+        np.testing.assert_array_equal(D, g.grad_batch(X))
+    
+    # one request per function in the sampling phase of every iteration, one per merit evaluation in the line search
+    n_iter = len(info['n_merit'])
+    n_ls = info['n_merit'].sum()
+    assert n_f == n_g == n_iter + n_ls
+    np.testing.assert_array_equal(x_hist, x_local)
+    
+    return
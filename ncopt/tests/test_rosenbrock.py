@@ -44,4 +44,17 @@ def test_rosenbrock_with_eq():
     x_k, x_hist, SP = SQP_GS(f, gI, gE, x0, tol = 1e-8, max_iter = 200, verbose = False)
     np.testing.assert_array_almost_equal(x_k, xstar, decimal = 4)
 
-    return
\ No newline at end of file
+    return
+
+def test_rosenbrock_adaptive_qp():
+    gI = [g]
+    gE = []
+    xstar = np.array([1/np.sqrt(2), 0.5])
+    x_k, x_hist, SP, info = SQP_GS(f, gI, gE, tol = 1e-8, max_iter = 200, verbose = False, return_info = True, rng = 0, adaptive_qp = True)
+    np.testing.assert_array_almost_equal(x_k, xstar, decimal = 4)
+
+    # the trajectories differ, hence compare the interior-point iterations per QP
+    _, _, _, info_exact = SQP_GS(f, gI, gE, tol = 1e-8, max_iter = 200, verbose = False, return_info = True, rng = 0)
+    assert info['qp_iter']/info['n_qp'] < info_exact['qp_iter']/info_exact['n_qp']
+
+    return
@@ -0,0 +1,67 @@
+"""
+author: Fabian Schaipp
+"""
+
+import numpy as np
+import sys, os
+
+tests_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, tests_path + '/../..')
+
+from ncopt.sampling import sample_points
+from ncopt.sqpgs import SQP_GS
+from ncopt.funs import f_rosenbrock, g_max
+
+def test_sample_in_ball():
+    x = np.array([1., -2., 0.5])
+    for method in ['random', 'sobol']:
+        X = sample_points(x, 0.1, 500, np.random.default_rng(0), method)
+        assert X.shape == (500, 3)
+        assert np.all(np.linalg.norm(X - x, axis = 1) <= 0.1)
+        # uniform in the ball: P(|z| <= eps/2) = 1/8
+        assert np.abs(np.mean(np.linalg.norm(X - x, axis = 1) <= 0.05) - 1/8) <= 0.05
+    
+    return
+
+def test_sample_batch():
+    X = np.random.rand(4, 2)
+    eps = np.array([1e-1, 1e-2, 1e-3, 1e-4])
+    B = sample_points(X, eps, 10, np.random.default_rng(0))
+    assert B.shape == (4, 10, 2)
+    assert np.all(np.linalg.norm(B - X[:,np.newaxis,:], axis = 2) <= eps[:,np.newaxis])
+    
+    return
+
+def test_reproducible():
+    f = f_rosenbrock(); g = g_max()
+    x0 = np.array([0.3, -0.2])
+    x1 = SQP_GS(f, [g], [], x0, max_iter = 30, verbose = False, rng = 42)[1]
+    x2 = SQP_GS(f, [g], [], x0, max_iter = 30, verbose = False, rng = np.random.default_rng(42))[1]
+    np.testing.assert_array_equal(x1, x2)
+    
+    return
+
+def test_rosenbrock_sobol():
+    f = f_rosenbrock(); g = g_max()
+    xstar = np.array([1/np.sqrt(2), 0.5])
+    x_k, x_hist, SP = SQP_GS(f, [g], [], tol = 1e-8, max_iter = 200, verbose = False, rng = 0, sampling = 'sobol')
+    np.testing.assert_array_almost_equal(x_k, xstar, decimal = 4)
+    
+    return
+
+def test_sobol_fewer_samples():
+    # Sobol with less than half of the default sample points needs about as many iterations as random sampling with the defaults
+    from ncopt.benchmarks import make_problem
+    p = make_problem('max_family', 2, 3)
+    
+    def run(sampling, n_samples):
+        infos = [SQP_GS(p['f'], p['gI'], p['gE'], max_iter = 150, verbose = False, return_info = True, rng = seed, 
+                        sampling = sampling, n_samples = n_samples)[3] for seed in range(6)]
+        assert all(info['status'] == 'optimal' for info in infos)
+        return np.mean([info['n_iter'] for info in infos])
+    
+    it_random = run('random', (2, 3, 4))
+    it_sobol = run('sobol', (1, 1, 2))
+    assert it_sobol <= 1.25 * it_random
+    
+    return
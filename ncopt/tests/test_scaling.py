@@ -0,0 +1,182 @@
+"""
+author: Fabian Schaipp
+
+Scaling tests for the phases of one SQP-GS iteration (Subproblem.update, Subproblem.solve, compute_gradients and
+update_hessian). For each phase, dim, the number of constraints and the number of sample points are varied. We fit the
+empirical complexity (exponent of a power law) and compare time and peak memory with scaling_baseline.json.
+
+Times are normalized by a reference workload, so that the baseline can be used on different machines. Peak memory 
+may exceed the baseline by 25%. The baseline has to be regenerated whenever one of the measured phases is changed, run
+
+    python ncopt/tests/test_scaling.py
+
+The environment variable NCOPT_SCALING_FACTOR (default 3) sets the allowed slowdown, NCOPT_SCALING_OUT can be set to
+a file name to which the measured results are written.
+"""
+
+import json
+import time
+import tracemalloc
+import numpy as np
+import pytest
+import sys, os
+
+tests_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, tests_path + '/../..')
+
+from ncopt.sqpgs import Subproblem, compute_gradients, update_hessian
+from ncopt.benchmarks.problems import f_rosenbrock_nd, g_max_nd
+
+BASELINE = os.path.join(tests_path, 'scaling_baseline.json')
+
+# default sizes, the swept parameter is replaced by the values in SWEEPS
+DEFAULT = {'dim': 10, 'n_con': 4, 'samples': 4}
+SWEEPS = {'dim': [10, 20, 40, 80], 'n_con': [1, 4, 16, 64], 'samples': [2, 4, 8, 16, 32]}
+PHASES = ['update', 'solve', 'compute_gradients', 'hessian']
+
+TIME_FACTOR = float(os.environ.get('NCOPT_SCALING_FACTOR', 3))
+TIME_FLOOR = 2e-4 # absolute slack in seconds (of the reference machine)
+# peak memory is deterministic (up to a few percent), the bound is relative to the baseline of each size
+MEM_FACTOR = 1.25
+
+def reference_time(repeats = 5):
+    """
+    time of a fixed workload (numpy linear algebra and a Python loop), used to normalize all timings
+    """
+    A = np.random.default_rng(0).random((200, 200))
+    times = list()
+    for r in range(repeats):
+        t0 = time.perf_counter()
+        np.linalg.solve(A @ A.T + np.eye(200), A[:,0])
+        s = 0
+        for i in range(20000):
+            s += i
+        times.append(time.perf_counter() - t0)
+    return np.median(times)
+
+def make_phase(phase, dim, n_con, samples):
+    """
+    returns a function without arguments that runs the phase once on random data of the given size
+    """
+    rng = np.random.default_rng(0)
+    nI = n_con; nE = 0
+    p0 = samples
+    pI = samples * np.ones(nI, dtype = int)
+    pE = np.zeros(nE, dtype = int)
+
+    H = np.eye(dim)
+    rho = 0.1
+    D_f = rng.standard_normal((p0+1, dim))
+    D_gI = [rng.standard_normal((pI[j]+1, dim)) for j in range(nI)]
+    D_gE = []
+    f_k = 1.
+    gI_k = rng.random(nI) - 1
+    gE_k = np.zeros(0)
+
+    if phase == 'update':
+        SP = Subproblem(dim, nI, nE, p0, pI, pE)
+        return lambda: SP.update(H, rho, D_f, D_gI, D_gE, f_k, gI_k, gE_k)
+
+    elif phase == 'solve':
+        SP = Subproblem(dim, nI, nE, p0, pI, pE)
+        SP.update(H, rho, D_f, D_gI, D_gE, f_k, gI_k, gE_k)
+        SP.solve()
+        return SP.solve
+
+    elif phase == 'compute_gradients':
+        funs = [f_rosenbrock_nd(dim)] + [g_max_nd(1 + rng.random(dim)) for j in range(n_con)]
+        X = rng.standard_normal((samples+1, dim))
+        # no grad_batch available, i.e. this measures the loop over the sample points
+        return lambda: [compute_gradients(fun, X) for fun in funs]
+
+    elif phase == 'hessian':
+        # pairs with positive curvature, which pass the safeguards
+        s_hist = rng.standard_normal((dim, 10))
+        y_hist = s_hist + 0.1*rng.standard_normal((dim, 10))
+        return lambda: update_hessian(s_hist, y_hist, 1.)
+
+def measure(phase, dim, n_con, samples, repeats = 5):
+    """
+    median run time and peak memory (traced by tracemalloc) of one call of the phase
+    """
+    fun = make_phase(phase, dim, n_con, samples)
+    fun()
+
+    times = list()
+    for r in range(repeats):
+        t0 = time.perf_counter()
+        fun()
+        times.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    fun()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return np.median(times), peak
+
+def run_sweep(phase, sweep, t_ref):
+    """
+    Returns
+    -------
+    dict with sizes, normalized times, peak memory and the fitted exponent (time ~ size^exponent)
+    """
+    sizes = SWEEPS[sweep]
+    times = list(); peaks = list()
+    for s in sizes:
+        kwargs = dict(DEFAULT); kwargs[sweep] = s
+        t, peak = measure(phase, **kwargs)
+        times.append(t / t_ref); peaks.append(peak)
+
+    exponent = np.polyfit(np.log(sizes), np.log(times), 1)[0]
+
+    return {'sizes': sizes, 'time': times, 'peak_memory': peaks, 'exponent': float(exponent)}
+
+@pytest.fixture(scope = 'module')
+def t_ref():
+    return reference_time()
+
+@pytest.fixture(scope = 'module')
+def baseline():
+    if not os.path.exists(BASELINE):
+        pytest.skip("no scaling baseline, run python ncopt/tests/test_scaling.py to create it")
+    with open(BASELINE) as file:
+        return json.load(file)
+
+@pytest.fixture(scope = 'module')
+def results():
+    res = dict()
+    yield res
+    out = os.environ.get('NCOPT_SCALING_OUT')
+    if out is not None:
+        with open(out, 'w') as file:
+            json.dump(res, file, indent = 1)
+
+@pytest.mark.parametrize('sweep', list(SWEEPS.keys()))
+@pytest.mark.parametrize('phase', PHASES)
+def test_scaling(phase, sweep, t_ref, baseline, results):
+    res = run_sweep(phase, sweep, t_ref)
+    results[f"{phase}/{sweep}"] = res
+    base = baseline[f"{phase}/{sweep}"]
+
+    assert res['sizes'] == base['sizes']
+
+    slack = TIME_FLOOR / baseline['t_ref']
+    for s, t, t0 in zip(res['sizes'], res['time'], base['time']):
+        assert t <= TIME_FACTOR*t0 + slack, f"{phase} with {sweep}={s}: normalized time {t:.3g} vs. baseline {t0:.3g} (exponent {res['exponent']:.2f} vs. {base['exponent']:.2f})"
+
+    for s, m, m0 in zip(res['sizes'], res['peak_memory'], base['peak_memory']):
+        assert m <= MEM_FACTOR*m0, f"{phase} with {sweep}={s}: peak memory {m} vs. baseline {m0} bytes"
+
+    return
+
+if __name__ == '__main__':
+    t = reference_time()
+    base = {'t_ref': t}
+    for phase in PHASES:
+        for sweep in SWEEPS:
+            base[f"{phase}/{sweep}"] = run_sweep(phase, sweep, t)
+            print(f"{phase:20s} {sweep:10s} exponent {base[f'{phase}/{sweep}']['exponent']:5.2f}")
+
+    with open(BASELINE, 'w') as file:
+        json.dump(base, file, indent = 1)
@@ -0,0 +1,101 @@
+"""
+author: Fabian Schaipp
+"""
+
+import numpy as np
+import sys, os
+
+tests_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, tests_path + '/../..')
+
+from ncopt.surrogate import SurrogateConstraint
+from ncopt.sqpgs import SQP_GS
+from ncopt.funs import f_rosenbrock, g_max
+
+class counting_g_max(g_max):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.n_eval = 0
+        self.n_grad = 0
+    
+    def eval(self, x):
+        self.n_eval += 1
+        return super().eval(x)
+    
+    def grad(self, x):
+        self.n_grad += 1
+        return super().grad(x)
+
+class smooth_max(g_max):
+    """
+    smooth approximation of g_max with a log-sum-exp of temperature t
+    """
+    def __init__(self, t = 1e-3):
+        super().__init__()
+        self.t = t
+    
+    def eval(self, x):
+        a = np.array([self.c1*x[0], self.c2*x[1]])/self.t
+        return self.t*np.logaddexp(a[0], a[1]) - 1
+    
+    def grad(self, x):
+        a = np.array([self.c1*x[0], self.c2*x[1]])/self.t
+        w = np.exp(a - np.logaddexp(a[0], a[1]))
+        return w*np.array([self.c1, self.c2])
+
+f = f_rosenbrock()
+xstar = np.array([1/np.sqrt(2), 0.5])
+
+def test_exact_surrogate():
+    g = counting_g_max()
+    G = SurrogateConstraint(g, g_max())
+    
+    x_k, x_hist, SP, info = SQP_GS(f, [G], [], tol = 1e-8, max_iter = 200, verbose = False, rng = 0, return_info = True)
+    np.testing.assert_array_almost_equal(x_k, xstar, decimal = 4)
+    
+    # true gradient only at x_k
+    assert g.n_grad == info['n_iter']
+    assert G.n_fallback == 0
+    
+    return
+
+def test_bad_surrogate():
+    g = counting_g_max()
+    # wrong weights: the monitor needs to detect this
+    G = SurrogateConstraint(g, g_max(c1 = 1., c2 = 1.), max_failures = 2)
+    
+    x_k, x_hist, SP, info = SQP_GS(f, [G], [], tol = 1e-8, max_iter = 200, verbose = False, rng = 0, return_info = True)
+    np.testing.assert_array_almost_equal(x_k, xstar, decimal = 4)
+    
+    # the surrogate is checked in every iteration and never switched off for good
+    assert G.n_fallback == np.sum(np.array(G.errors) > G.tol) > 2
+    assert len(G.errors) == info['n_iter']
+    assert G.n_retrain == 0 and not G.active
+    
+    # after a fallback, values and gradients both come from the true oracle
+    B = x_k + 1e-3*np.random.default_rng(0).standard_normal((5, 2))
+    np.testing.assert_array_almost_equal(G.eval_samples(B)[:,0], [g.eval(b) for b in B])
+    assert not G.active
+    
+    return
+
+def test_retrain():
+    G = SurrogateConstraint(g_max(), g_max(c1 = 1., c2 = 1.), max_failures = 1, retrain = lambda fun, x: g_max())
+    
+    x_k, x_hist, SP = SQP_GS(f, [G], [], tol = 1e-8, max_iter = 200, verbose = False, rng = 0)
+    np.testing.assert_array_almost_equal(x_k, xstar, decimal = 4)
+    
+    assert G.n_retrain == 1 and G.active
+    
+    return
+
+def test_smooth_surrogate_at_kink():
+    # x_k converges to the kink of g_max, where the Jacobians of a smooth surrogate are necessarily wrong
+    G = SurrogateConstraint(g_max(), smooth_max())
+    
+    x_k, x_hist, SP = SQP_GS(f, [G], [], tol = 1e-8, max_iter = 100, verbose = False, rng = 0)
+    np.testing.assert_array_almost_equal(x_k, xstar, decimal = 4)
+    
+    assert G.n_fallback == 0 and G.active
+    
+    return
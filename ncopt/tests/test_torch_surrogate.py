@@ -0,0 +1,81 @@
+"""
+author: Fabian Schaipp
+"""
+
+import numpy as np
+import pytest
+import sys, os
+
+tests_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, tests_path + '/../..')
+
+torch = pytest.importorskip('torch')
+
+from ncopt.torch_surrogate import fit_surrogate, normal_sampler, sample_stream
+from ncopt.funs import g_linear
+
+def test_sample_stream():
+    g = g_linear(np.array([[1., 2.], [0., -1.]]), np.ones(2))
+    chunks = list(sample_stream(g, normal_sampler(np.zeros(2)), 250, chunk_size = 100, rng = 0))
+    
+    assert [len(X) for X, Y in chunks] == [100, 100, 50]
+    X, Y = chunks[-1]
+    np.testing.assert_array_almost_equal(Y, X @ g.A.T - g.b)
+    
+    return
+
+def test_sample_stream_workers():
+    g = g_linear(np.array([[1., 2.], [0., -1.]]), np.ones(2))
+    calls = list()
+    def sampler(rng, n):
+        calls.append(n)
+        return rng.standard_normal((n, 2))
+    
+    stream = sample_stream(g, sampler, 5000, chunk_size = 100, n_workers = 1, rng = 0)
+    X, Y = next(stream)
+    # inputs are sampled lazily, only a bounded number of chunks is in flight
+    assert len(calls) <= 2
+    chunks = [(X, Y)] + list(stream)
+    stream.close()
+    
+    # same samples as without workers
+    serial = list(sample_stream(g, sampler, 5000, chunk_size = 100, rng = 0))
+    assert len(chunks) == len(serial) == 50
+    for (X, Y), (X0, Y0) in zip(chunks, serial):
+        np.testing.assert_array_equal(X, X0)
+        np.testing.assert_array_almost_equal(Y, Y0)
+    
+    return
+
+def test_fit_linear():
+    g = g_linear(np.array([[1., 2.], [0., -1.]]), np.ones(2))
+    torch.manual_seed(0)
+    model = torch.nn.Sequential(torch.nn.Linear(2, 2))
+    
+    net = fit_surrogate(g, normal_sampler(np.zeros(2)), n_samples = 2000, model = model, n_epochs = 20, lr = 1e-2, seed = 0)
+    assert net.dimOut == 2
+    
+    X = np.random.default_rng(1).standard_normal((10, 2))
+    np.testing.assert_array_almost_equal(net.eval_batch(X), g.eval_batch(X), decimal = 2)
+    
+    # batched Jacobians
+    D = net.grad_batch(X)
+    assert D.shape == (10, 2, 2)
+    for i in range(10):
+        np.testing.assert_array_almost_equal(D[i], g.A, decimal = 2)
+    
+    return
+
+def test_fit_buffer():
+    g = g_linear(np.array([[1., 2.], [0., -1.]]), np.ones(2))
+    torch.manual_seed(0)
+    model = torch.nn.Sequential(torch.nn.Linear(2, 2))
+    
+    # only 5 of the 20 chunks are replayed after the first epoch
+    net = fit_surrogate(g, normal_sampler(np.zeros(2)), n_samples = 2000, model = model, chunk_size = 100, n_epochs = 40, 
+                        lr = 1e-2, buffer_size = 500, seed = 0)
+    
+    X = np.random.default_rng(1).standard_normal((10, 2))
+    np.testing.assert_array_almost_equal(net.eval_batch(X), g.eval_batch(X), decimal = 2)
+    
+    return
@@ -39,4 +39,36 @@ class Net:
         y_torch.backward()
 
         return x_torch.grad.data.numpy()
+    
+    def eval_batch(self, X):
+        """
+        evaluates the network at all rows of X, returns array of shape N x dimOut
+        """
+        assert X.shape[1] == self.dimIn, f"Input for Net has wrong dimension, required dimension is {self.dimIn}."
+        
+        with torch.no_grad():
+            Y = self.D.forward(torch.tensor(X, dtype=torch.float32))
+        
+        return Y.numpy().reshape(X.shape[0], self.dimOut)
+    
+    def grad_batch(self, X):
+        """
+        Jacobians at all rows of X, returns array of shape N x dimOut x dimIn
+        the rows are processed as one batch, i.e. one forward and dimOut backward passes
+        """
+        assert X.shape[1] == self.dimIn, f"Input for Net has wrong dimension, required dimension is {self.dimIn}."
+        
+        x_torch = torch.tensor(X, dtype=torch.float32)
+        x_torch.requires_grad_(True)
+        
+        y_torch = self.D(x_torch).reshape(X.shape[0], self.dimOut)
+        
+        # rows are independent (network is in evaluation mode), hence the gradient of the sum over rows
+        # contains the gradient of each row
+        D = np.zeros((X.shape[0], self.dimOut, self.dimIn), dtype = np.float32)
+        for j in range(self.dimOut):
+            g, = torch.autograd.grad(y_torch[:,j].sum(), x_torch, retain_graph = (j < self.dimOut-1))
+            D[:,j,:] = g.numpy()
+        
+        return D
           
\ No newline at end of file
@@ -0,0 +1,182 @@
+"""
+author: Fabian Schaipp
+
+Training of a neural network surrogate for an (expensive) constraint function. The constraint is sampled with its
+batched oracle (or on a process pool), the data is streamed in chunks into the training loop and the result is
+returned as a ncopt.torch_obj.Net, which can be used as a constraint in SQP-GS.
+"""
+
+import numpy as np
+import torch
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .sqpgs import eval_rows
+from .torch_obj import Net
+
+def normal_sampler(center, scale = 1.):
+    """
+    returns a sampler: (rng, n) --> n points normally distributed around center with standard deviation scale
+    """
+    center = np.asarray(center, dtype = float)
+    def sampler(rng, n):
+        return center + scale * rng.standard_normal((n, len(center)))
+    return sampler
+
+def box_sampler(lower, upper):
+    """
+    returns a sampler: (rng, n) --> n points uniformly distributed in the box [lower, upper]
+    """
+    lower = np.asarray(lower, dtype = float); upper = np.asarray(upper, dtype = float)
+    def sampler(rng, n):
+        return lower + (upper - lower) * rng.random((n, len(lower)))
+    return sampler
+
+def sample_stream(fun, sampler, n_samples, chunk_size = 1000, n_workers = 0, rng = None):
+    """
+    generator of chunks (X, Y) with X of shape (n, dim) and Y = fun(X) of shape (n, dimOut)
+
+    Parameters
+    ----------
+    fun : function object
+        the constraint, evaluated with fun.eval_batch if available (otherwise row by row).
+    sampler : callable
+        (rng, n) --> array of n input points, see normal_sampler and box_sampler.
+    n_samples : int
+        total number of samples.
+    chunk_size : int, optional
+        number of samples per chunk. The default is 1000.
+    n_workers : int, optional
+        if > 0, the chunks are evaluated on a process pool with n_workers processes (fun needs to be picklable).
+        At most 2*n_workers chunks are in flight, the next chunk is only sampled when one is consumed.
+        The default is 0.
+    rng : np.random.Generator, int or None, optional
+        source of randomness for the sampler.
+    """
+    rng = np.random.default_rng(rng)
+    sizes = [chunk_size] * (n_samples // chunk_size)
+    if n_samples % chunk_size > 0:
+        sizes.append(n_samples % chunk_size)
+
+    if n_workers == 0:
+        for n in sizes:
+            X = sampler(rng, n)
+            yield X, eval_rows(fun, X)
+    else:
+        with ProcessPoolExecutor(max_workers = n_workers) as executor:
+            # chunks are returned in order, same samples as for n_workers = 0
+            pending = deque()
+            for n in sizes:
+                X = sampler(rng, n)
+                pending.append((X, executor.submit(eval_rows, fun, X)))
+                if len(pending) >= 2*n_workers:
+                    X, future = pending.popleft()
+                    yield X, future.result()
+            while len(pending) > 0:
+                X, future = pending.popleft()
+                yield X, future.result()
+
+def mlp(dim, dimOut = 1, width = 64, depth = 2):
+    """
+    fully connected ReLU network, default architecture for fit_surrogate
+    """
+    layers = [torch.nn.Linear(dim, width), torch.nn.ReLU()]
+    for l in range(depth-1):
+        layers += [torch.nn.Linear(width, width), torch.nn.ReLU()]
+    layers.append(torch.nn.Linear(width, dimOut))
+    return torch.nn.Sequential(*layers)
+
+def fit_surrogate(fun, sampler, n_samples = 10000, model = None, dim = None, chunk_size = 1000, n_epochs = 10, batch_size = 64,
+                  lr = 1e-3, n_workers = 0, buffer_size = None, seed = None, verbose = False):
+    """
+    fits a neural network to the constraint fun
+
+    In the first epoch, the chunks from sample_stream are trained on as they arrive and kept as float32 tensors in a
+    replay buffer; all further epochs reuse the buffer, i.e. fun is evaluated exactly n_samples times. By default the
+    buffer holds all samples, which needs 4*(dim+dimOut)*n_samples bytes. With buffer_size, at most that many samples
+    are kept (a uniformly random subset of the chunks) and the memory does not grow with n_samples; the epochs after
+    the first then only see the buffered samples.
+
+    Parameters
+    ----------
+    fun : function object
+        constraint with attribute dimOut and method eval (optionally eval_batch).
+    sampler : callable
+        (rng, n) --> array of n input points, see normal_sampler and box_sampler.
+    n_samples : int, optional
+        number of evaluations of fun. The default is 10000.
+    model : torch.nn.Sequential, optional
+        network to train, first module needs to be torch.nn.Linear. The default is mlp(dim, fun.dimOut).
+    dim : int, optional
+        input dimension, only needed if model is None and fun has no attribute dim.
+    chunk_size, n_workers :
+        see sample_stream.
+    buffer_size : int, optional
+        maximal number of samples kept for the epochs after the first, rounded up to full chunks.
+        The default is None, i.e. all samples are kept.
+    n_epochs : int, optional
+        number of passes over the data. The default is 10.
+    batch_size : int, optional
+        minibatch size. The default is 64.
+    lr : float, optional
+        learning rate of Adam. The default is 1e-3.
+    seed : int, optional
+        seed for sampling and training.
+
+    Returns
+    -------
+    Net
+        the trained network, ready to use as constraint for SQP_GS.
+    """
+    rng = np.random.default_rng(seed)
+    if seed is not None:
+        torch.manual_seed(seed)
+
+    if model is None:
+        model = mlp(dim if dim is not None else fun.dim, fun.dimOut)
+
+    loss_fn = torch.nn.MSELoss(reduction = 'mean')
+    optimizer = torch.optim.Adam(model.parameters(), lr = lr)
+    model.train(True)
+
+    def train_chunk(tX, tY):
+        perm = torch.randperm(len(tX))
+        total = 0.
+        for start in range(0, len(tX), batch_size):
+            S = perm[start:start+batch_size]
+            loss = loss_fn(model(tX[S]), tY[S])
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total += loss.item() * len(S)
+        return total
+
+    # pytorch weights are in torch.float32, numpy data is float64!
+    chunks = list()
+    max_chunks = np.inf if buffer_size is None else max(int(np.ceil(buffer_size/chunk_size)), 1)
+    for epoch in range(n_epochs):
+        total = 0.
+        if epoch == 0:
+            for i, (X, Y) in enumerate(sample_stream(fun, sampler, n_samples, chunk_size, n_workers, rng)):
+                tX = torch.tensor(X, dtype = torch.float32)
+                tY = torch.tensor(np.reshape(Y, (len(X), fun.dimOut)), dtype = torch.float32)
+                total += train_chunk(tX, tY)
+                # reservoir sampling: every chunk is in the buffer with the same probability
+                if len(chunks) < max_chunks:
+                    chunks.append((tX, tY))
+                else:
+                    c = rng.integers(i+1)
+                    if c < max_chunks:
+                        chunks[c] = (tX, tY)
+            n_seen = n_samples
+        else:
+            for c in rng.permutation(len(chunks)):
+                total += train_chunk(*chunks[c])
+            n_seen = sum(len(tX) for tX, tY in chunks)
+
+        if verbose:
+            print(f"epoch {epoch}: training loss {total/n_seen:.4g}")
+
+    optimizer.zero_grad()
+
+    return Net(model, dimOut = fun.dimOut)